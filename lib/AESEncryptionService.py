@@ -1,14 +1,74 @@
+from functools import lru_cache
+from typing import Iterable, List
+
 from Crypto.Cipher import AES
+from Crypto.Util.Padding import pad, unpad
+from Crypto.Util.strxor import strxor
 
 # Namespace: MX.Data AESEncryptionService
+# These are not valid AES sizes (25 and 10 bytes) and how the client turns
+# them into a key/IV has not been recovered, so passing them straight to the
+# functions below raises ValueError rather than producing a guessed cipher.
 AESKey: bytes = "GameDevelopmentDepartment".encode("utf8")
 AESIV: bytes = "TendouAris".encode("utf8")
 
+BlockSize: int = AES.block_size
+
+
+class AESContext:
+    # CBC/PKCS7 (the .NET Aes defaults) around one expanded key. Decryption
+    # runs through a single ECB object: CBC plaintext is ECB_dec(C[i]) ^ C[i-1],
+    # so any number of blobs can share the key schedule and be decrypted in
+    # one ECB call plus one strxor.
+    def __init__(self, key: bytes) -> None:
+        if len(key) not in AES.key_size:
+            raise ValueError(f"AES key must be 16, 24 or 32 bytes, got {len(key)}")
+        self.key = key
+        self._ecb = AES.new(key=key, mode=AES.MODE_ECB)
+
+    def encrypt(self, data: bytes, iv: bytes) -> bytes:
+        _CheckIV(iv)
+        return AES.new(key=self.key, iv=iv, mode=AES.MODE_CBC).encrypt(pad(data, BlockSize))
+
+    def decrypt(self, data: bytes, iv: bytes) -> bytes:
+        return self.decrypt_many([data], iv)[0]
+
+    def decrypt_many(self, blobs: Iterable[bytes], iv: bytes) -> List[bytes]:
+        _CheckIV(iv)
+        blobs = list(blobs)
+        for blob in blobs:
+            if not blob or len(blob) % BlockSize:
+                raise ValueError("cipher text is not a whole number of AES blocks")
+        cipherText = b"".join(blobs)
+        # previous cipher block for every block, restarting at iv per blob
+        chain = b"".join(iv + blob[:-BlockSize] for blob in blobs)
+        plain = strxor(self._ecb.decrypt(cipherText), chain)
+
+        out = []
+        offset = 0
+        for blob in blobs:
+            out.append(unpad(plain[offset : offset + len(blob)], BlockSize))
+            offset += len(blob)
+        return out
+
+
+def _CheckIV(iv: bytes) -> None:
+    if len(iv) != BlockSize:
+        raise ValueError(f"AES IV must be {BlockSize} bytes, got {len(iv)}")
+
+
+@lru_cache(maxsize=64)
+def GetContext(key: bytes) -> AESContext:
+    return AESContext(key)
+
+
 def EncryptStringToBytes_Aes(plainText: str, Key: bytes, IV: bytes) -> bytes:
-    # same as StringCipher?
-    pass
+    return GetContext(Key).encrypt(plainText.encode("utf8"), IV)
 
 
 def DecryptStringFromBytes_Aes(cipherText: bytes, Key: bytes, IV: bytes) -> str:
-    # same as StringCipher?
-    pass
+    return GetContext(Key).decrypt(cipherText, IV).decode("utf8")
+
+
+def DecryptStringsFromBytes_Aes(cipherTexts: Iterable[bytes], Key: bytes, IV: bytes) -> List[str]:
+    return [plain.decode("utf8") for plain in GetContext(Key).decrypt_many(cipherTexts, IV)]
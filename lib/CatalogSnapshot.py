@@ -0,0 +1,142 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Iterable, Iterator, NamedTuple, Optional, Tuple, Union
+import mmap
+import os
+import struct
+
+
+class CatalogEntry(NamedTuple):
+    entity_type: int
+    entity_id: int
+    name: str
+    dev_name: Optional[str]
+    rarity: Optional[int]
+
+
+# Read-only entity catalog written by tools/build_catalog.py next to the
+# sqlite catalog, for consumers that only need id -> name/rarity lookups.
+#   header: magic, format version, entry count, built_at length
+#   built_at (utf8, padded to 8 bytes)
+#   ids         int64[count]       sorted by (type, id)
+#   types       int32[count]
+#   rarity      int32[count]       NO_RARITY where unknown
+#   names       uint32[count + 1]  offsets into the name blob
+#   dev names   uint32[count + 1]  offsets into the dev name blob, empty = none
+#   name blob, dev name blob (utf8)
+# Integers are little-endian; the arrays are mapped as-is, no parsing on load.
+_SNAPSHOT_HEADER = struct.Struct("<4sIII")
+_SNAPSHOT_MAGIC = b"BACS"
+_SNAPSHOT_FORMAT = 1
+NO_RARITY = -(2**31)
+
+Row = Tuple[int, int, str, Optional[str], Optional[int]]
+
+
+def WriteCatalogSnapshot(path: Union[str, os.PathLike], rows: Iterable[Row], built_at: str = "") -> int:
+    rows = sorted(rows, key=lambda row: (row[0], row[1]))
+    stamp = built_at.encode("utf8")
+    ids = array("q", [row[1] for row in rows])
+    types = array("i", [row[0] for row in rows])
+    rarity = array("i", [NO_RARITY if row[4] is None else row[4] for row in rows])
+    names = [row[2].encode("utf8") for row in rows]
+    devs = [(row[3] or "").encode("utf8") for row in rows]
+
+    def offsets(blobs):
+        out = array("I", [0])
+        for blob in blobs:
+            out.append(out[-1] + len(blob))
+        return out
+
+    tmp = f"{os.fspath(path)}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(_SNAPSHOT_HEADER.pack(_SNAPSHOT_MAGIC, _SNAPSHOT_FORMAT, len(rows), len(stamp)))
+        f.write(stamp + bytes(-len(stamp) % 8))
+        for column in (ids, types, rarity, offsets(names), offsets(devs)):
+            f.write(column.tobytes())
+        f.write(b"".join(names))
+        f.write(b"".join(devs))
+    os.replace(tmp, path)
+    return len(rows)
+
+
+class CatalogSnapshot:
+    def __init__(self, path: Union[str, os.PathLike]) -> None:
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, fmt, count, stamp_len = _SNAPSHOT_HEADER.unpack_from(self._map)
+        if magic != _SNAPSHOT_MAGIC or fmt != _SNAPSHOT_FORMAT:
+            self._map.close()
+            raise ValueError(f"{path} is not a format {_SNAPSHOT_FORMAT} catalog snapshot")
+        pos = _SNAPSHOT_HEADER.size
+        self.built_at = self._map[pos : pos + stamp_len].decode("utf8")
+        pos += stamp_len + (-stamp_len % 8)
+
+        self._view = view = memoryview(self._map)
+        self._columns = []
+
+        def column(fmt: str, width: int, length: int) -> memoryview:
+            nonlocal pos
+            col = view[pos : pos + width * length].cast(fmt)
+            self._columns.append(col)
+            pos += width * length
+            return col
+
+        self._ids = column("q", 8, count)
+        self._types = column("i", 4, count)
+        self._rarity = column("i", 4, count)
+        self._name_offsets = column("I", 4, count + 1)
+        self._dev_offsets = column("I", 4, count + 1)
+        self._names = view[pos : pos + self._name_offsets[count]]
+        self._devs = view[pos + self._name_offsets[count] :]
+        self._columns += [self._names, self._devs]
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __getitem__(self, i: int) -> CatalogEntry:
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        dev = self._devs[self._dev_offsets[i] : self._dev_offsets[i + 1]].tobytes().decode("utf8")
+        rarity = self._rarity[i]
+        return CatalogEntry(self._types[i], self._ids[i], self.name(i), dev or None,
+                            None if rarity == NO_RARITY else rarity)
+
+    def __iter__(self) -> Iterator[CatalogEntry]:
+        return (self[i] for i in range(len(self)))
+
+    def __contains__(self, key: Tuple[int, int]) -> bool:
+        return self.find(*key) >= 0
+
+    def name(self, i: int) -> str:
+        return self._names[self._name_offsets[i] : self._name_offsets[i + 1]].tobytes().decode("utf8")
+
+    def type_range(self, entity_type: int) -> range:
+        # indices of one entity type; types is sorted, so two bisects
+        return range(bisect_left(self._types, entity_type), bisect_right(self._types, entity_type))
+
+    def find(self, entity_type: int, entity_id: int) -> int:
+        span = self.type_range(entity_type)
+        i = bisect_left(self._ids, entity_id, span.start, span.stop)
+        if i < span.stop and self._ids[i] == entity_id:
+            return i
+        return -1
+
+    def get(self, entity_type: int, entity_id: int) -> Optional[CatalogEntry]:
+        i = self.find(entity_type, entity_id)
+        return self[i] if i >= 0 else None
+
+    def entities(self, entity_type: int) -> Iterator[CatalogEntry]:
+        return (self[i] for i in self.type_range(entity_type))
+
+    def close(self) -> None:
+        for column in self._columns:
+            column.release()
+        self._view.release()
+        self._map.close()
+
+    def __enter__(self) -> "CatalogSnapshot":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -1,8 +1,10 @@
 # from _typeshed import Self
-from typing import List
+from typing import List, Tuple
 import time
 from math import floor
 
+import numpy as np
+
 double = float
 
 _int = int
@@ -13,6 +15,34 @@ class uint(_int):
         return value & 0xFFFFFFFF
 
 
+def _twist(mt: np.ndarray) -> None:
+    # Regenerates the 624-word state in place. The C# loops are split into
+    # slices that only read words which are already final for this round:
+    # mt[kk + M] is untouched for kk < N - M, and after that mt[kk - (N - M)]
+    # always lies in a slice computed by a previous step.
+    N, M = MersenneTwister.N, MersenneTwister.M
+    upper = np.uint32(MersenneTwister.UPPER_MASK)
+    lower = np.uint32(MersenneTwister.LOWER_MASK)
+    matrix_a = np.uint32(MersenneTwister.MATRIX_A)
+
+    y = (mt[: N - M] & upper) | (mt[1 : N - M + 1] & lower)
+    mt[: N - M] = mt[M:] ^ (y >> 1) ^ ((y & 1) * matrix_a)
+    for start in range(N - M, N - 1, N - M):
+        end = min(start + N - M, N - 1)
+        y = (mt[start:end] & upper) | (mt[start + 1 : end + 1] & lower)
+        mt[start:end] = mt[start - (N - M) : end - (N - M)] ^ (y >> 1) ^ ((y & 1) * matrix_a)
+    y = (mt[N - 1] & upper) | (mt[0] & lower)
+    mt[N - 1] = mt[M - 1] ^ (y >> 1) ^ ((y & 1) * matrix_a)
+
+
+def _temper(mt: np.ndarray) -> np.ndarray:
+    y = mt ^ (mt >> 11)
+    y ^= (y << 7) & np.uint32(0x9D2C5680)
+    y ^= (y << 15) & np.uint32(0xEFC60000)
+    y ^= y >> 18
+    return y
+
+
 class MersenneTwister:
     # Class MersenneTwister generates random numbers
     # from a uniform distribution using the Mersenne
@@ -24,14 +54,33 @@ class MersenneTwister:
     LOWER_MASK: uint = 0x7FFFFFFF
     MAX_RAND_INT: int = 0x7FFFFFFF
     mag01: List[uint] = [0x0, MATRIX_A]
-    mt: List[uint] = [0] * N
-    mti: int = N + 1
+
+    # state lives on the instance (mt as a uint32 array, _block as its
+    # tempered copy) so independent generators never share a buffer
+    __slots__ = ("mt", "mti", "_block")
 
     def __init__(self, seed: int = None) -> None:
+        self.mti = self.N + 1
         if seed == None:
             seed = time.timens()
         self.init_genrand(uint(seed))
 
+    def snapshot(self) -> Tuple[bytes, int]:
+        return self.mt.tobytes(), self.mti
+
+    def restore(self, state: Tuple[bytes, int]) -> None:
+        mt, mti = state
+        self.mt = np.frombuffer(mt, dtype=np.uint32).copy()
+        self.mti = mti
+        if mti < self.N:
+            self._block = _temper(self.mt)
+
+    @classmethod
+    def from_snapshot(cls, state: Tuple[bytes, int]) -> "MersenneTwister":
+        twister = cls.__new__(cls)
+        twister.restore(state)
+        return twister
+
     # public MersenneTwister(int[] init)
     # {
     #     uint[] initArray = new uint[init.Length];
@@ -71,10 +120,12 @@ class MersenneTwister:
         return self.genrand_res53()
 
     def NextBytes(self, length: int) -> bytes:
-        return b"".join(
-            self.genrand_int31().to_bytes(4, "little", signed=False)
-            for _ in range(0, length, 4)
-        )[:length]
+        return self.next_bytes_bulk(length)
+
+    def next_bytes_bulk(self, length: int) -> bytes:
+        # same stream as NextBytes in the client: one genrand_int31 per 4 bytes
+        words = self.genrand_int32_bulk((length + 3) >> 2) >> 1
+        return words.astype("<u4", copy=False).tobytes()[:length]
 
     # public void Initialize()
     # { init_genrand((uint)DateTime.Now.Millisecond); }
@@ -88,12 +139,11 @@ class MersenneTwister:
     #     init_by_array(initArray, (uint)initArray.Length);
     # }
     def init_genrand(self, s: uint) -> None:
-        self.mt[0] = s & 0xFFFFFFFF
+        mt = [0] * self.N
+        mt[0] = s & 0xFFFFFFFF
         for mti in range(1, self.N):
-            self.mt[mti] = (
-                uint(1812433253 * (self.mt[mti - 1] ^ (self.mt[mti - 1] >> 30)) + mti)
-                & 0xFFFFFFFF
-            )
+            mt[mti] = (1812433253 * (mt[mti - 1] ^ (mt[mti - 1] >> 30)) + mti) & 0xFFFFFFFF
+        self.mt = np.array(mt, dtype=np.uint32)
         self.mti = self.N
 
     # private void init_by_array(uint[] init_key, uint key_length)
@@ -121,44 +171,33 @@ class MersenneTwister:
     #     mt[0] = 0x80000000U;
     # }
 
+    def _next_block(self) -> None:
+        if self.mti == self.N + 1:
+            self.init_genrand(5489)
+        _twist(self.mt)
+        self._block = _temper(self.mt)
+        self.mti = 0
+
     def genrand_int32(self) -> uint:
-        y: uint
         if self.mti >= self.N:
-            kk: int
-            if self.mti == self.N + 1:
-                self.init_genrand(5489)
-            for kk in range(self.N - self.M):
-                y = uint(
-                    (self.mt[kk] & self.UPPER_MASK)
-                    | (self.mt[kk + 1] & self.LOWER_MASK)
-                )
-                self.mt[kk] = uint(
-                    self.mt[kk + self.M] ^ (y >> 1) ^ self.mag01[y & 0x1]
-                )
-            for kk in range(self.N - self.M, self.N - 1):
-                y = uint(
-                    (self.mt[kk] & self.UPPER_MASK)
-                    | (self.mt[kk + 1] & self.LOWER_MASK)
-                )
-                self.mt[kk] = uint(
-                    self.mt[kk + (self.M - self.N)] ^ (y >> 1) ^ self.mag01[y & 0x1]
-                )
-
-            y = uint(
-                (self.mt[self.N - 1] & self.UPPER_MASK) | (self.mt[0] & self.LOWER_MASK)
-            )
-            self.mt[self.N - 1] = uint(
-                self.mt[self.M - 1] ^ (y >> 1) ^ self.mag01[y & 0x1]
-            )
-            self.mti = 0
-
-        y = self.mt[self.mti]
+            self._next_block()
+        y = self._block[self.mti]
         self.mti += 1
-        y = uint(y ^ (y >> 11))
-        y = uint(y ^ ((y << 7) & 0x9D2C5680))
-        y = uint(y ^ ((y << 15) & 0xEFC60000))
-        y = uint(y ^ (y >> 18))
-        return y
+        return int(y)
+
+    def genrand_int32_bulk(self, count: int) -> np.ndarray:
+        # count tempered words as a uint32 array, consumed exactly like count
+        # successive genrand_int32 calls
+        out = np.empty(count, dtype=np.uint32)
+        pos = 0
+        while pos < count:
+            if self.mti >= self.N:
+                self._next_block()
+            take = min(count - pos, self.N - self.mti)
+            out[pos : pos + take] = self._block[self.mti : self.mti + take]
+            self.mti += take
+            pos += take
+        return out
 
     def genrand_int31(self) -> int:
         return int(self.genrand_int32() >> 1)
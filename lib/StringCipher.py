@@ -1,4 +1,8 @@
 from base64 import b64decode, b64encode
+from codecs import getincrementaldecoder
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import IO, Iterable, Iterator, List, Union
 from Crypto.Protocol.KDF import PBKDF2
 from Crypto.Cipher import AES
 from Crypto.Util.Padding import pad, unpad
@@ -28,7 +32,7 @@ def Encrypt(plainText: str, passPhrase: str) -> str:
     iv = get_random_bytes(0x10) # GenerateRandomEntropy
     derived = PBKDF2(passPhrase, salt, 16, count=DerivationIterations)
     cipher = AES.new(key=derived[:16], iv=iv, mode=AES.MODE_CBC)
-    data = pad(cipher.encrypt(plainText.encode("utf8")), BlockSize, style="pkcs7")
+    data = cipher.encrypt(pad(plainText.encode("utf8"), BlockSize, style="pkcs7"))
     return b64encode(salt + iv + data).decode("utf8")
     
 
@@ -38,10 +42,83 @@ def Decrypt(cipherText: str, passPhrase: str) -> str:
     salt = rawCipherText[:16]
     iv = rawCipherText[16:32]
     rawCipherText = rawCipherText[32:]
-    derived = PBKDF2(passPhrase, salt, 16, count=DerivationIterations)
+    derived = _DeriveKey(passPhrase, salt)
     cipher = AES.new(key=derived[:16], iv=iv, mode=AES.MODE_CBC)
     return unpad(cipher.decrypt(rawCipherText), BlockSize, style="pkcs7").decode('utf-8')
-    
+
+
+def DecryptStream(cipherText: Union[str, IO[str], Iterable[str]], passPhrase: str, chunkSize: int = 1 << 16) -> Iterator[bytes]:
+    # Same format as Decrypt, but consumes the base64 text piecewise and yields
+    # plaintext as soon as whole CBC blocks are available. The last block is
+    # held back until the input ends since only it carries the padding.
+    if hasattr(cipherText, "read"):
+        chunks = iter(lambda: cipherText.read(chunkSize), "")
+    elif isinstance(cipherText, str):
+        chunks = (cipherText[i : i + chunkSize] for i in range(0, len(cipherText), chunkSize))
+    else:
+        chunks = iter(cipherText)
+
+    text = ""  # base64 not yet decodable (less than one quantum)
+    raw = b""  # decoded bytes not yet decrypted
+    cipher = None
+    for chunk in chunks:
+        text += "".join(chunk.split())
+        usable = len(text) & ~3
+        raw += b64decode(text[:usable])
+        text = text[usable:]
+        if cipher is None:
+            if len(raw) < 32:
+                continue
+            cipher = AES.new(key=_DeriveKey(passPhrase, raw[:16]), iv=raw[16:32], mode=AES.MODE_CBC)
+            raw = raw[32:]
+        ready = max(len(raw) - BlockSize, 0) & ~(BlockSize - 1)
+        if ready:
+            yield cipher.decrypt(raw[:ready])
+            raw = raw[ready:]
+
+    raw += b64decode(text)
+    if cipher is None:
+        raise ValueError("cipher text is shorter than salt + IV")
+    last = unpad(cipher.decrypt(raw), BlockSize, style="pkcs7")
+    if last:
+        yield last
+
+
+def DecryptStreamText(cipherText: Union[str, IO[str], Iterable[str]], passPhrase: str, chunkSize: int = 1 << 16) -> Iterator[str]:
+    decoder = getincrementaldecoder("utf-8")()
+    for data in DecryptStream(cipherText, passPhrase, chunkSize):
+        text = decoder.decode(data)
+        if text:
+            yield text
+    text = decoder.decode(b"", final=True)
+    if text:
+        yield text
+
+
+# Decrypt derives the same key again for every file sharing a passphrase and
+# salt; 1000 PBKDF2 rounds dominate small files, so keep recent keys around.
+@lru_cache(maxsize=256)
+def _DeriveKey(passPhrase: str, salt: bytes) -> bytes:
+    return PBKDF2(passPhrase, salt, 16, count=DerivationIterations)
+
+
+def LoadEncryptedDataFile(fileName: str, decryptKey: str) -> str:
+    # TextFileHelper.LoadEncryptedDataFile: File.ReadAllText + Decrypt
+    with open(fileName, "r", encoding="utf-8-sig") as f:
+        return Decrypt(f.read(), decryptKey)
+
+
+def LoadEncryptedDataFileStream(fileName: str, decryptKey: str, chunkSize: int = 1 << 16) -> Iterator[str]:
+    with open(fileName, "r", encoding="utf-8-sig") as f:
+        yield from DecryptStreamText(f, decryptKey, chunkSize)
+
+
+def decrypt_many(paths: Iterable[str], pass_phrase: str, max_workers: int = None) -> List[str]:
+    # PBKDF2 and AES in PyCryptodome release the GIL, so threads scale here
+    with ThreadPoolExecutor(max_workers=max_workers) as ex:
+        return list(ex.map(lambda path: LoadEncryptedDataFile(path, pass_phrase), paths))
+
+
 # def GenerateRandomEntropy() -> bytes:
 #     pass
 
@@ -49,7 +126,7 @@ def Decrypt(cipherText: str, passPhrase: str) -> str:
 def EncryptStringToBytes(plainText: str, Key: bytes, IV: bytes) -> bytes:
     # not sure about how the text is encoded, C# directly uses the charcode
     cipher = AES.new(key=Key, iv=IV, mode=AES.MODE_CBC)
-    return pad(cipher.encrypt(plainText.encode("utf8")), BlockSize)
+    return cipher.encrypt(pad(plainText.encode("utf8"), BlockSize))
 
 
 def DecryptStringFromBytes(cipherText: bytes, Key: bytes, IV: bytes) -> str:
@@ -58,9 +135,20 @@ def DecryptStringFromBytes(cipherText: bytes, Key: bytes, IV: bytes) -> str:
     return unpad(cipher.decrypt(cipherText), BlockSize).decode('utf-8')
 
 
+# The client's AES-256 string format (key derivation, IV, encoding) has not
+# been recovered and there are no client test vectors, so these refuse to run
+# rather than produce data the client would not accept. AESEncryptionService's
+# GetContext(...).encrypt/decrypt/decrypt_many do the batch work once it is.
+_AES256_UNKNOWN = "AES-256 string format is not known yet; no client test vectors to verify against"
+
+
 def AESEncrypt256(Input: str, key: str) -> str:
-    pass
+    raise NotImplementedError(_AES256_UNKNOWN)
 
 
 def AESDecrypt256(Input: str, key: str) -> bytes:
-    pass
+    raise NotImplementedError(_AES256_UNKNOWN)
+
+
+def AESDecrypt256Many(Inputs: Iterable[str], key: str) -> List[bytes]:
+    raise NotImplementedError(_AES256_UNKNOWN)
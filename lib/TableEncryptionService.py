@@ -1,8 +1,14 @@
-from typing import Union
+from typing import Dict, List, Sequence, Tuple, Union
 from struct import Struct
+from collections import OrderedDict
+from functools import lru_cache
+from keyword import iskeyword
+from threading import Lock
+import numpy as np
 from . import XXHashService
 from .MersenneTwister import MersenneTwister
 from base64 import b64decode, b64encode
+from binascii import a2b_base64
 
 # from itertools import cycle
 from Crypto.Util.strxor import strxor, strxor_c
@@ -14,19 +20,119 @@ int64 = Struct("<q")
 float32 = Struct("<f")
 float64 = Struct("<d")
 
+# payloads at least this long take the NumPy word path in _XOR
+_NUMPY_XOR_MIN = 1 << 12
+
+
+class KeystreamCache:
+    # LRU of MersenneTwister keystreams keyed by seed. Each entry keeps the
+    # longest prefix handed out so far plus the generator that produced it,
+    # so a longer request only generates the missing tail. Prefixes are
+    # kept word aligned because NextBytes drops the rest of its last word.
+    # Bounded by entry count and by total prefix bytes; requests longer than
+    # max_entry are generated without touching the cache, so one big blob
+    # cannot pin its whole keystream.
+    def __init__(self, maxsize: int = 4096, max_bytes: int = 16 << 20, max_entry: int = 64 << 10) -> None:
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.max_entry = max_entry
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self._bytes = 0
+        self._entries: "OrderedDict[int, list]" = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, seed: int, length: int) -> bytes:
+        with self._lock:
+            entry = self._entries.get(seed)
+            if entry is not None and len(entry[0]) >= length:
+                self.hits += 1
+                self._entries.move_to_end(seed)
+                return bytes(memoryview(entry[0])[:length])
+            if length > self.max_entry:
+                self.bypassed += 1
+                entry = None
+            elif entry is None:
+                self.misses += 1
+                entry = self._entries[seed] = [bytearray(), MersenneTwister(seed)]
+            else:
+                self.hits += 1
+                self._entries.move_to_end(seed)
+
+            if entry is not None:
+                grow = entry[1].next_bytes_bulk((length - len(entry[0]) + 3) & ~3)
+                entry[0] += grow
+                self._bytes += len(grow)
+                self._evict()
+                return bytes(memoryview(entry[0])[:length])
+        return MersenneTwister(seed).next_bytes_bulk(length)
+
+    def _evict(self) -> None:
+        # oldest first; the entry just used is last and always stays
+        while len(self._entries) > 1 and (len(self._entries) > self.maxsize or self._bytes > self.max_bytes):
+            _, (prefix, _) = self._entries.popitem(last=False)
+            self._bytes -= len(prefix)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self.hits = self.misses = self.bypassed = 0
+
+    def info(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "bypassed": self.bypassed,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "max_entry": self.max_entry,
+            }
+
+
+keystream_cache = KeystreamCache()
+
+
+_seed_table: Dict[str, int] = {}
+
+
+def LoadSeedIndex(index: "XXHashService.HashIndex") -> None:
+    # serve name -> seed from a prebuilt XXHashService.HashIndex, hashing
+    # only names the index does not know. The index is decoded into a dict
+    # once: a bisect over the mapping costs ~30x more than hashing the name.
+    global _seed_table
+    _seed_table = index.to_dict()
+
+
+def _Seed(name: str) -> int:
+    seed = _seed_table.get(name)
+    return seed if seed is not None else _HashSeed(name)
+
+
+@lru_cache(maxsize=65536)
+def _HashSeed(name: str) -> int:
+    return XXHashService.CalculateHash(name)
+
 
 def CreateKey(name: str) -> bytes:  # 0x02AAE200-0x02AAE288
     # v3 = XXHashService_CalculateHash(name, 0LL);
-    seed = XXHashService.CalculateHash(name)
+    seed = _Seed(name)
     # v4 = sub_1996DC4(MersenneTwister__TypeInfo);
     # MersenneTwister__ctor_1(v4, v3, 0LL);
-    return MersenneTwister(seed).NextBytes(8)
+    return keystream_cache.get(seed, 8)
 
 
-def XOR(name: str, data: bytes) -> bytes:
-    seed = XXHashService.CalculateHash(name)
-    twister = MersenneTwister(seed)
-    key = twister.NextBytes(len(data))
+def XOR(name: str, data: bytes, cache: bool = True) -> bytes:
+    # cache=False for one-off blobs (whole table files) whose keystream is
+    # not worth keeping around
+    if cache:
+        key = keystream_cache.get(_Seed(name), len(data))
+    else:
+        key = MersenneTwister(_Seed(name)).next_bytes_bulk(len(data))
 
     if len(data) >= 1:
         data = _XOR(data, key)
@@ -35,17 +141,40 @@ def XOR(name: str, data: bytes) -> bytes:
 
 def _XOR(value: bytes, key: bytes) -> bytes:
     # return bytes(x ^ y for x, y in zip(value, key))
-    if len(value) == len(key):
-        return strxor(value, key)
-    elif len(value) < len(key):
-        return strxor(value, key[: len(value)])
+    # Writable buffers (bytearray, writable memoryview) are xored in place and
+    # returned as-is; bytes input yields one new bytes object.
+    out = value if _IsWritable(value) else None
+    if len(value) <= len(key):
+        # a bytes slice: strxor is several times slower on memoryviews
+        mask = key if len(value) == len(key) else key[: len(value)]
+    elif len(key) == 8 and len(value) >= _NUMPY_XOR_MIN:
+        buf = value if out is not None else bytearray(value)
+        _XOR_Words(buf, key)
+        return buf if out is not None else bytes(buf)
     else:
-        return b"".join(
-            strxor(value[i : i + len(key)], key) for i in range(0, len(value) - len(key) + 1, len(key))
-        ) + strxor(
-            value[(len(value) - (len(value) % len(key))) :],
-            key[: len(value) % len(key)],
-        )
+        mask = _TileKey(key, len(value))
+    result = strxor(value, mask, output=out)
+    return value if out is not None else result
+
+
+def _IsWritable(value) -> bool:
+    if isinstance(value, bytearray):
+        return True
+    return isinstance(value, memoryview) and not value.readonly
+
+
+def _TileKey(key: bytes, length: int) -> bytes:
+    return (key * -(-length // len(key)))[:length]
+
+
+def _XOR_Words(buf, key: bytes) -> None:
+    # xor an 8-byte key over buf as uint64 words, in place
+    whole = len(buf) & ~7
+    words = np.frombuffer(buf, dtype=np.uint64, count=whole >> 3)
+    words ^= np.frombuffer(key, dtype=np.uint64)[0]
+    if whole < len(buf):
+        tail = memoryview(buf)[whole:]
+        strxor(tail, key[: len(tail)], output=tail)
 
 
 def _XOR_Struct(value: Union[int, float], key: bytes, struct: str) -> Union[int, float]:
@@ -76,6 +205,50 @@ def ConvertDouble(value: float, key: bytes) -> float:
     return ConvertLong(int(value), key) * 0.00001 if value else 0.0
 
 
+# Column variants: one vectorized XOR over the little-endian words of a whole
+# column instead of a pack/_XOR/unpack round trip per cell. Zero cells stay
+# zero, like the scalar helpers.
+
+
+def _XOR_Column(values, key: bytes, dtype: str) -> np.ndarray:
+    column = np.array(values, dtype=dtype)
+    mask = np.frombuffer(_TileKey(key, column.itemsize), dtype=dtype)[0]
+    nonzero = column != 0
+    column[nonzero] ^= mask
+    return column
+
+
+def _TruncateColumn(values, dtype: str) -> np.ndarray:
+    column = np.asarray(values)
+    if column.dtype.kind == "f":
+        column = np.trunc(column)
+    return column.astype(dtype)
+
+
+def ConvertInts(values, key: bytes) -> np.ndarray:
+    return _XOR_Column(values, key, "<i4")
+
+
+def ConvertLongs(values, key: bytes) -> np.ndarray:
+    return _XOR_Column(values, key, "<i8")
+
+
+def ConvertUInts(values, key: bytes) -> np.ndarray:
+    return _XOR_Column(values, key, "<u4")
+
+
+def ConvertULongs(values, key: bytes) -> np.ndarray:
+    return _XOR_Column(values, key, "<u8")
+
+
+def ConvertFloats(values, key: bytes) -> np.ndarray:
+    return ConvertInts(_TruncateColumn(values, "<i4"), key) * 0.00001
+
+
+def ConvertDoubles(values, key: bytes) -> np.ndarray:
+    return ConvertLongs(_TruncateColumn(values, "<i8"), key) * 0.00001
+
+
 def EncryptFloat(value: float, key: bytes) -> float:
     return ConvertInt(int(value * 100000), key) if value else 0.0
 
@@ -92,8 +265,60 @@ def ConvertString(value: str, key: bytes) -> str:
     try:
         raw = b64decode(value)
         return _XOR(raw, key).decode("utf16")
-    except:
-        return value.decode("utf8")
+    except (ValueError, UnicodeDecodeError):
+        return _Verbatim(value)
+
+
+def _Verbatim(value: Union[str, bytes]) -> str:
+    return value.decode("utf8") if isinstance(value, (bytes, bytearray)) else value
+
+
+def _VerbatimCell(value: Union[str, bytes]) -> str:
+    # column fallback: a bytes cell that is not UTF-8 either is still reported
+    # through failed, with the undecodable bytes replaced, instead of raising
+    try:
+        return _Verbatim(value)
+    except UnicodeDecodeError:
+        return value.decode("utf8", "replace")
+
+
+def ConvertStrings(values: Sequence[Union[str, bytes]], key: bytes) -> Tuple[List[str], List[int]]:
+    # Decodes a whole string column. Every payload is laid out on a key-length
+    # boundary in one buffer so a single in-place _XOR covers the column.
+    # Returns the decoded strings and the indices of cells that were not
+    # base64/UTF-16 and were kept verbatim, as ConvertString does (bytes cells
+    # that are not UTF-8 either come back with replacement characters).
+    results = [""] * len(values)
+    failed = []
+    raws = []
+    for i, value in enumerate(values):
+        if not value:
+            continue
+        try:
+            raws.append((i, a2b_base64(value)))
+        except ValueError:
+            results[i] = _VerbatimCell(value)
+            failed.append(i)
+
+    offsets = []
+    total = 0
+    for _, raw in raws:
+        offsets.append(total)
+        total += -(-len(raw) // len(key)) * len(key)
+    buf = bytearray(total)
+    for offset, (_, raw) in zip(offsets, raws):
+        buf[offset : offset + len(raw)] = raw
+    _XOR(buf, key)
+
+    view = memoryview(buf)
+    for offset, (i, raw) in zip(offsets, raws):
+        try:
+            results[i] = str(view[offset : offset + len(raw)], "utf16")
+        except UnicodeDecodeError:
+            results[i] = _VerbatimCell(values[i])
+            failed.append(i)
+    failed.sort()
+    return results, failed
 
 
 def EncryptString(value: str, key: bytes) -> str:
@@ -102,3 +327,79 @@ def EncryptString(value: str, key: bytes) -> str:
     raw = value.encode("utf16")
     return b64encode(_XOR(raw, key)).decode()
     # return b64encode(bytes(r ^ k for r, k in zip(raw, cycle(key))))
+
+
+# Schema-driven row decoding. A schema maps column name -> type, in row order:
+#   {"Id": "long", "DevName": "string", "Rarity": "int", "Tags": "int[]"}
+# Scalar types are the Convert* helpers above, "raw" passes the value through
+# and a "[]" suffix decodes every element of a list column.
+_ROW_CONVERTERS = {
+    "int": "ConvertInt",
+    "long": "ConvertLong",
+    "uint": "ConvertUInt",
+    "ulong": "ConvertULong",
+    "float": "ConvertFloat",
+    "double": "ConvertDouble",
+    "string": "ConvertString",
+}
+
+
+class RowDecoder:
+    # Compiled per table: column keys are derived with CreateKey once and the
+    # decode function is generated with one inlined converter call per column,
+    # so the hot loop does no key derivation, type dispatch or dict building.
+    # Keys come from the column names unless table is given, in which case
+    # every column uses CreateKey(table).
+    def __init__(self, schema: Dict[str, str], table: str = None, record: bool = False, by_name: bool = True) -> None:
+        self.columns = tuple(schema)
+        self.types = tuple(schema.values())
+        self.keys = tuple(CreateKey(table if table else column) for column in self.columns)
+        self.record = _RecordClass(table or "Row", self.columns) if record else None
+
+        namespace = {name: globals()[name] for name in _ROW_CONVERTERS.values()}
+        namespace["Record"] = self.record
+        fields = []
+        for i, (column, type_) in enumerate(zip(self.columns, self.types)):
+            namespace[f"k{i}"] = self.keys[i]
+            cell = f"row[{column!r}]" if by_name else f"row[{i}]"
+            base = type_[:-2] if type_.endswith("[]") else type_
+            if base == "raw":
+                expr = cell
+            elif base in _ROW_CONVERTERS:
+                expr = f"{_ROW_CONVERTERS[base]}({{}}, k{i})"
+                expr = f"[{expr.format('v')} for v in {cell}]" if type_.endswith("[]") else expr.format(cell)
+            else:
+                raise ValueError(f"unknown column type {type_!r} for {column!r}")
+            fields.append(expr)
+
+        body = ", ".join(fields)
+        body = f"Record({body})" if record else f"({body}{',' if len(fields) == 1 else ''})"
+        exec(f"def decode(row):\n    return {body}\n", namespace)
+        self.decode = namespace["decode"]
+
+    def __call__(self, rows):
+        return map(self.decode, rows)
+
+
+def _RecordClass(name: str, columns: Tuple[str, ...]) -> type:
+    for column in columns:
+        if not column.isidentifier() or iskeyword(column) or column == "self":
+            raise ValueError(f"column {column!r} is not a valid record field")
+    args = ", ".join(columns)
+    assigns = "".join(f"\n    self.{column} = {column}" for column in columns) or "\n    pass"
+    namespace: Dict[str, object] = {}
+    exec(f"def __init__(self, {args}):{assigns}\n", namespace)
+    return type(
+        name,
+        (),
+        {
+            "__slots__": columns,
+            "__init__": namespace["__init__"],
+            "__iter__": lambda self: (getattr(self, column) for column in columns),
+            "__repr__": lambda self: f"{name}({', '.join(f'{c}={getattr(self, c)!r}' for c in columns)})",
+        },
+    )
+
+
+def CompileRowDecoder(schema: Dict[str, str], table: str = None, record: bool = False, by_name: bool = True) -> RowDecoder:
+    return RowDecoder(schema, table=table, record=record, by_name=by_name)
@@ -1,20 +1,133 @@
 # from _typeshed import StrPath
 from io import BytesIO
-from typing import IO
-from zipfile import ZipFile
+from typing import IO, Dict, Iterable, Optional
+from zipfile import ZipFile, ZipInfo
+from hashlib import sha1
+from pathlib import Path
+import mmap
 import os
+import zlib
 from .XXHashService import CalculateHash
 from typing import Union
 
 
+class DecryptedTableCache:
+    # On-disk store of decrypted members, addressed by (bundle, member, CRC32)
+    # so a member is only decrypted again once a patch changes its content.
+    # compression is None, "zlib" or "zstd" (needs the zstandard package).
+    SUFFIXES = {None: ".bin", "zlib": ".zz", "zstd": ".zst"}
+
+    def __init__(self, root: Union[str, Path], compression: Optional[str] = None) -> None:
+        if compression not in self.SUFFIXES:
+            raise ValueError(f"unknown compression {compression!r}")
+        if compression == "zstd":
+            import zstandard
+
+            self._zstd = (zstandard.ZstdCompressor(), zstandard.ZstdDecompressor())
+        self.root = Path(root)
+        self.compression = compression
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, bundle: str, member: str, crc: int) -> Path:
+        digest = sha1(f"{bundle}\0{member}\0{crc:08x}".encode("utf8")).hexdigest()
+        return self.root / digest[:2] / (digest[2:] + self.SUFFIXES[self.compression])
+
+    def get(self, bundle: str, member: str, crc: int) -> Optional[bytes]:
+        try:
+            data = self._path(bundle, member, crc).read_bytes()
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        if self.compression == "zlib":
+            data = zlib.decompress(data)
+        elif self.compression == "zstd":
+            data = self._zstd[1].decompress(data)
+        if zlib.crc32(data) != crc:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return data
+
+    def put(self, bundle: str, member: str, crc: int, data: bytes) -> None:
+        if self.compression == "zlib":
+            data = zlib.compress(data, 1)
+        elif self.compression == "zstd":
+            data = self._zstd[0].compress(data)
+        path = self._path(bundle, member, crc)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+
+
 class TableZipFile(ZipFile):
-    def __init__(self, file: Union[str, BytesIO], name: str = None) -> None:
+    def __init__(self, file: Union[str, BytesIO], name: str = None, cache: DecryptedTableCache = None) -> None:
         super().__init__(file)
-        self.password = str(
-            CalculateHash(name if not isinstance(file, str) else os.path.basename(file))
-        ).encode()
-
-    def open(self, name: str, mode: str = "r", force_zip64=False):
-        return super(self.__class__, self).open(
-            name, mode, pwd=self.password, force_zip64=force_zip64
-        )
+        self.bundle_name = name if not isinstance(file, str) else os.path.basename(file)
+        self.password = str(CalculateHash(self.bundle_name)).encode()
+        self.cache = cache
+
+    def open(self, name: Union[str, ZipInfo], mode: str = "r", force_zip64=False):
+        if self.cache is None or mode != "r":
+            return super().open(
+                name, mode, pwd=self.password, force_zip64=force_zip64
+            )
+        # cached members are served as an in-memory stream
+        info = name if isinstance(name, ZipInfo) else self.getinfo(name)
+        data = self.cache.get(self.bundle_name, info.filename, info.CRC)
+        if data is None:
+            with super().open(info, pwd=self.password) as f:
+                data = f.read()
+            self.cache.put(self.bundle_name, info.filename, info.CRC, data)
+        return BytesIO(data)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.NameToInfo
+
+    def read_many(self, names: Iterable[str]) -> Dict[str, bytes]:
+        # reads members in archive order through the one shared handle,
+        # returned in the order they were asked for
+        infos = [self.getinfo(name) for name in names]
+        data = {}
+        for info in sorted(infos, key=lambda info: info.header_offset):
+            with self.open(info) as f:
+                data[info.filename] = f.read()
+        return {info.filename: data[info.filename] for info in infos}
+
+
+class _MappedFile(mmap.mmap):
+    # ZipFile wants seekable() on its file object, which mmap only grew in 3.13
+    def seekable(self) -> bool:
+        return True
+
+
+class MappedTableZipFile(TableZipFile):
+    # TableZipFile over a read-only mmap of the bundle: the central directory
+    # and member data are read straight from the mapping instead of through
+    # buffered file I/O, and every open() shares that one mapping.
+    def __init__(self, file: str, name: str = None, cache: DecryptedTableCache = None) -> None:
+        # set first: ZipFile.__del__ calls close() even when open() fails
+        self._handle = self._map = None
+        self._handle = open(file, "rb")
+        try:
+            self._map = _MappedFile(self._handle.fileno(), 0, access=mmap.ACCESS_READ)
+            super().__init__(self._map, name or os.path.basename(file), cache)
+        except BaseException:
+            self._close_map()
+            raise
+        self.filename = os.fspath(file)
+
+    def close(self) -> None:
+        try:
+            super().close()
+        finally:
+            self._close_map()
+
+    def _close_map(self) -> None:
+        if getattr(self, "_map", None) is not None:
+            self._map.close()
+            self._map = None
+        if getattr(self, "_handle", None) is not None:
+            self._handle.close()
+            self._handle = None
@@ -1,4 +1,9 @@
-from typing import Union
+from array import array
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Union
+import mmap
+import os
+import struct
 from xxhash import xxh32_intdigest
 
 
@@ -6,3 +11,90 @@ def CalculateHash(name: Union[bytes, str]) -> int:
     if isinstance(name, str):
         name = name.encode("utf8")
     return xxh32_intdigest(name, 0)
+
+
+def calculate_many(names: Iterable[Union[bytes, str]]) -> List[int]:
+    return [
+        xxh32_intdigest(name.encode("utf8") if isinstance(name, str) else name, 0)
+        for name in names
+    ]
+
+
+# Persistent name -> hash index, built once per client version.
+#   header: magic, format version, entry count, client version length
+#   client version (utf8, padded to 4 bytes)
+#   hashes  uint32[count]      in name order
+#   offsets uint32[count + 1]  into the name blob
+#   names   utf8, sorted bytewise
+# Integers are little-endian; the arrays are mapped as-is, no parsing on load.
+_INDEX_HEADER = struct.Struct("<4sIII")
+_INDEX_MAGIC = b"BAXH"
+_INDEX_FORMAT = 1
+
+
+def BuildHashIndex(path: Union[str, os.PathLike], names: Iterable[Union[bytes, str]], client_version: str) -> int:
+    keys = sorted({name.encode("utf8") if isinstance(name, str) else bytes(name) for name in names})
+    version = client_version.encode("utf8")
+    hashes = array("I", calculate_many(keys))
+    offsets = array("I", [0])
+    for key in keys:
+        offsets.append(offsets[-1] + len(key))
+
+    tmp = f"{os.fspath(path)}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(_INDEX_HEADER.pack(_INDEX_MAGIC, _INDEX_FORMAT, len(keys), len(version)))
+        f.write(version + bytes(-len(version) % 4))
+        f.write(hashes.tobytes())
+        f.write(offsets.tobytes())
+        f.write(b"".join(keys))
+    os.replace(tmp, path)
+    return len(keys)
+
+
+class HashIndex:
+    def __init__(self, path: Union[str, os.PathLike]) -> None:
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, fmt, count, version_len = _INDEX_HEADER.unpack_from(self._map)
+        if magic != _INDEX_MAGIC or fmt != _INDEX_FORMAT:
+            self._map.close()
+            raise ValueError(f"{path} is not a format {_INDEX_FORMAT} hash index")
+        pos = _INDEX_HEADER.size
+        self.client_version = self._map[pos : pos + version_len].decode("utf8")
+        pos += version_len + (-version_len % 4)
+
+        self._view = view = memoryview(self._map)
+        self._hashes = view[pos : pos + 4 * count].cast("I")
+        pos += 4 * count
+        self._offsets = view[pos : pos + 4 * (count + 1)].cast("I")
+        self._names = view[pos + 4 * (count + 1) :]
+
+    def __len__(self) -> int:
+        return len(self._hashes)
+
+    def __getitem__(self, i: int) -> bytes:
+        return self._names[self._offsets[i] : self._offsets[i + 1]].tobytes()
+
+    def to_dict(self) -> Dict[str, int]:
+        # whole index as {name: hash}, for callers that look up every name
+        # often enough that a one-off decode beats bisecting per lookup
+        names, offsets = self._names.tobytes(), self._offsets.tolist()
+        return {
+            names[offsets[i] : offsets[i + 1]].decode("utf8"): h
+            for i, h in enumerate(self._hashes.tolist())
+        }
+
+    def get(self, name: Union[bytes, str]) -> Optional[int]:
+        if isinstance(name, str):
+            name = name.encode("utf8")
+        i = bisect_left(self, name)
+        if i < len(self) and self[i] == name:
+            return self._hashes[i]
+        return None
+
+    def close(self) -> None:
+        self._hashes.release()
+        self._offsets.release()
+        self._names.release()
+        self._view.release()
+        self._map.close()
@@ -1,4 +1,5 @@
 #!/usr/bin/env python3
+import asyncio
 import json
 import logging
 import os
@@ -9,6 +10,7 @@ from datetime import datetime, timedelta
 from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
 
 from mitmproxy import ctx, http
 
@@ -39,6 +41,9 @@ PRIVATE_PORT: int = int(os.getenv("BA_PRIVATE_PORT", "7000"))
 PRIVATE_SCHEME: str = os.getenv("BA_PRIVATE_SCHEME", "http")
 PRIVATE_SERVER: Tuple[str, int] = (PRIVATE_HOST, PRIVATE_PORT)
 ADMIN_BASE = f"{PRIVATE_SCHEME}://{PRIVATE_HOST}:{PRIVATE_PORT}/admin/mail"
+# Hard cap (seconds) on holding a Mail_List response for the outbox fetch;
+# past it the response goes to the client untouched.
+INJECT_DEADLINE: float = float(os.getenv("BA_INJECT_DEADLINE", "1.0"))
 
 # Where SchaleDB json lives (ids → types)
 DATA_DIR = Path(os.getenv("BA_DATA_DIR", "data")) / "en"
@@ -61,27 +66,46 @@ LOGS_DIR.mkdir(exist_ok=True)
 
 # --- Tiny local HTTP helpers (no requests dependency) ------------------------
 
-def _http_get_json(url: str, timeout: float = 2.0) -> Optional[Dict]:
-    import urllib.request, urllib.error
-    try:
-        with urllib.request.urlopen(url, timeout=timeout) as r:
-            data = r.read().decode("utf-8")
-            return json.loads(data)
-    except Exception as e:
-        ctx.log.warn(f"[ADDON] GET {url} failed: {e}")
-        return None
+# Coroutines on mitmproxy's event loop: plain asyncio streams speaking
+# HTTP/1.0 (one request per connection, no chunked bodies), so a slow admin
+# API only delays the flow being injected, never the proxy. Callers bound
+# them with asyncio.wait_for; cancellation closes the connection.
 
-def _http_post_json(url: str, payload: Dict, timeout: float = 2.0) -> Optional[Dict]:
-    import urllib.request, urllib.error
+async def _http_json(method: str, url: str, payload: Optional[Dict] = None) -> Optional[Dict]:
+    writer = None
     try:
-        body = json.dumps(payload).encode("utf-8")
-        req = urllib.request.Request(url, data=body, headers={"Content-Type": "application/json"})
-        with urllib.request.urlopen(req, timeout=timeout) as r:
-            data = r.read().decode("utf-8")
-            return json.loads(data) if data else {}
+        parts = urlsplit(url)
+        https = parts.scheme == "https"
+        reader, writer = await asyncio.open_connection(
+            parts.hostname, parts.port or (443 if https else 80), ssl=True if https else None
+        )
+        body = json.dumps(payload).encode("utf-8") if payload is not None else b""
+        target = parts.path + (f"?{parts.query}" if parts.query else "")
+        head = f"{method} {target} HTTP/1.0\r\nHost: {parts.netloc}\r\nAccept: application/json\r\n"
+        if payload is not None:
+            head += f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n"
+        writer.write(head.encode("latin-1") + b"\r\n" + body)
+        await writer.drain()
+        raw = await reader.read()
+
+        status_line, _, rest = raw.partition(b"\r\n")
+        status = int(status_line.split(None, 2)[1])
+        data = rest.partition(b"\r\n\r\n")[2].decode("utf-8")
+        if status >= 400:
+            raise ValueError(f"HTTP {status}")
+        return json.loads(data) if data.strip() else {}
     except Exception as e:
-        ctx.log.warn(f"[ADDON] POST {url} failed: {e}")
+        ctx.log.warn(f"[ADDON] {method} {url} failed: {e}")
         return None
+    finally:
+        if writer is not None:
+            writer.close()
+
+async def _http_get_json(url: str) -> Optional[Dict]:
+    return await _http_json("GET", url)
+
+async def _http_post_json(url: str, payload: Dict) -> Optional[Dict]:
+    return await _http_json("POST", url, payload)
 
 # --- Stats & logging ---------------------------------------------------------
 
@@ -211,6 +235,9 @@ class BlueArchiveAddon:
     def __init__(self):
         self._control_thread_started = False
         self._kind_map = {}  # itemId -> parcel type (2 currency, 4 item)
+        self._outbox_locks: Dict[Optional[int], asyncio.Lock] = {}  # acct -> outbox fetch in progress
+        self._unacked: Dict[Optional[int], Dict[str, Optional[int]]] = {}  # acct -> injected mail key -> Id, not yet cleared
+        self._clears: Dict[Optional[int], asyncio.Task] = {}  # acct -> clear in flight
 
     # ---------- helpers for SchaleDB kinds ----------
     def _load_ids(self, path: Path, kind: int):
@@ -337,7 +364,7 @@ class BlueArchiveAddon:
             "ParcelInfos": parcels,
         }
 
-    def _inject_mail(self, flow: http.HTTPFlow):
+    async def _inject_mail(self, flow: http.HTTPFlow):
         # Only when NOT flipped and the host looks like official BA gateway
         if state.flipped or not self._looks_like_gateway(flow):
             return
@@ -362,41 +389,87 @@ class BlueArchiveAddon:
             return
 
         acct_id = self._guess_account_id(packet)
-        # Pull outbox
+        # One outbox fetch per account at a time, so a second Mail_List sees
+        # what the first one injected in _unacked
+        lock = self._outbox_locks.setdefault(acct_id, asyncio.Lock())
+        async with lock:
+            await self._inject_outbox(flow, data, packet, acct_id)
+
+    @staticmethod
+    def _mail_key(qmail: Dict) -> str:
+        return str(qmail["Id"]) if qmail.get("Id") is not None else json.dumps(qmail, sort_keys=True)
+
+    async def _inject_outbox(self, flow: http.HTTPFlow, data: Dict, packet: Dict, acct_id: Optional[int]):
+        # Pull outbox; this is the only await, so once it returns the response
+        # is rewritten and the clear scheduled without the deadline being able
+        # to cut in between
         outbox_url = f"{ADMIN_BASE}/outbox"
         if acct_id is not None:
             outbox_url += f"?accountServerId={acct_id}"
-        outbox = _http_get_json(outbox_url)
-        if not outbox or not outbox.get("mails"):
+        outbox = await _http_get_json(outbox_url)
+        if not outbox:
+            return
+        if not outbox.get("mails"):
+            self._unacked.pop(acct_id, None)
             return
+        persistent = bool(outbox.get("persistent"))
+
+        # Mails injected earlier whose clear has not gone through yet are
+        # still queued; they were delivered, so skip them instead of
+        # injecting them twice. Keys no longer queued were cleared.
+        queued = {self._mail_key(qm): qm for qm in outbox["mails"]}
+        unacked = self._unacked.setdefault(acct_id, {})
+        for key in list(unacked):
+            if key not in queued:
+                del unacked[key]
 
         to_add = []
-        for qm in outbox["mails"]:
+        for key, qm in queued.items():
             # If queued mail targets a different account, skip
             target = qm.get("AccountServerId")
             if acct_id is not None and target not in (None, acct_id):
                 continue
+            if key in unacked:
+                continue
             to_add.append(self._maildb_from_queued(qm, acct_id))
-
-        if not to_add:
+            if not persistent:
+                unacked[key] = qm.get("Id")
+
+        if to_add:
+            packet.setdefault("MailDBs", []).extend(to_add)
+            packet["Count"] = len(packet["MailDBs"])
+
+            # Write back into the outer wrapper (packet is a JSON **string** field)
+            data["packet"] = json.dumps(packet, separators=(",", ":"))
+            flow.response.text = json.dumps(data, separators=(",", ":"))
+            ctx.log.info(f"[INJECT] Added {len(to_add)} admin mails to Mail_List (acct={acct_id})")
+
+        # Clear if not persistent, only after injecting, in a task of its own:
+        # the response deadline cannot cancel it, and a failed clear is
+        # retried on the next Mail_List while _unacked keeps the mails from
+        # being injected again
+        if unacked and acct_id not in self._clears:
+            task = asyncio.get_running_loop().create_task(self._clear_outbox(acct_id, dict(unacked)))
+            self._clears[acct_id] = task
+            task.add_done_callback(lambda _: self._clears.pop(acct_id, None))
+
+    async def _clear_outbox(self, acct_id: Optional[int], mails: Dict[str, Optional[int]]):
+        # Names the injected mails when they carry ids, so mail queued after
+        # the fetch stays queued; an admin API that ignores the body clears
+        # the whole outbox, as before
+        clr_url = f"{ADMIN_BASE}/clear"
+        if acct_id is not None:
+            clr_url += f"?accountServerId={acct_id}"
+        ids = list(mails.values())
+        payload = {"ids": ids} if None not in ids else {}
+        if await _http_post_json(clr_url, payload) is None:
+            ctx.log.warn(f"[INJECT] outbox clear failed (acct={acct_id}), retrying on the next Mail_List")
             return
+        unacked = self._unacked.get(acct_id, {})
+        for key in mails:
+            unacked.pop(key, None)
 
-        packet.setdefault("MailDBs", []).extend(to_add)
-        packet["Count"] = len(packet["MailDBs"])
-
-        # Write back into the outer wrapper (packet is a JSON **string** field)
-        data["packet"] = json.dumps(packet, separators=(",", ":"))
-        flow.response.text = json.dumps(data, separators=(",", ":"))
-        ctx.log.info(f"[INJECT] Added {len(to_add)} admin mails to Mail_List (acct={acct_id})")
-
-        # Clear if not persistent
-        if not outbox.get("persistent"):
-            clr_url = f"{ADMIN_BASE}/clear"
-            if acct_id is not None:
-                clr_url += f"?accountServerId={acct_id}"
-            _http_post_json(clr_url, {})
-
-    def response(self, flow: http.HTTPFlow) -> None:
+    async def response(self, flow: http.HTTPFlow) -> None:
         start_time = getattr(flow, "_start_time", time.time())
         duration_ms = (time.time() - start_time) * 1000
         upstream = "PRIVATE" if state.flipped else "OFFICIAL"
@@ -405,10 +478,14 @@ class BlueArchiveAddon:
         flow.response.headers["x-proxy-upstream"] = upstream
         (state.stats.increment_private if upstream == "PRIVATE" else state.stats.increment_official)()
 
-        # Try injection when not flipped
+        # Try injection when not flipped; a timeout can only hit the outbox
+        # fetch, before anything is injected or cleared, so it leaves both the
+        # response and the outbox as they were
         try:
             if not state.flipped:
-                self._inject_mail(flow)
+                await asyncio.wait_for(self._inject_mail(flow), INJECT_DEADLINE)
+        except asyncio.TimeoutError:
+            ctx.log.warn(f"[INJECT] admin API missed the {INJECT_DEADLINE}s deadline, passing response through")
         except Exception as e:
             ctx.log.warn(f"[INJECT] failed: {e}")
 
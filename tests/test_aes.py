@@ -0,0 +1,50 @@
+import pytest
+
+from lib import AESEncryptionService as AESService
+from lib import StringCipher
+from lib.AESEncryptionService import GetContext
+
+# NIST SP 800-38A F.2.1 (CBC-AES128.Encrypt), first block
+NIST_KEY = bytes.fromhex("2b7e151628aed2a6abf7158809cf4f3c")
+NIST_IV = bytes.fromhex("000102030405060708090a0b0c0d0e0f")
+NIST_PLAIN = bytes.fromhex("6bc1bee22e409f96e93d7e117393172a")
+NIST_CIPHER = bytes.fromhex("7649abac8119b246cee98e9b12e9197d")
+
+
+def test_cbc_known_answer():
+    ctx = GetContext(NIST_KEY)
+    blob = ctx.encrypt(NIST_PLAIN, NIST_IV)
+    assert blob[:16] == NIST_CIPHER and len(blob) == 32  # plus one PKCS7 block
+    assert ctx.decrypt(blob, NIST_IV) == NIST_PLAIN
+
+
+def test_decrypt_many_matches_single():
+    ctx = GetContext(b"k" * 32)
+    iv = bytes(range(16))
+    plains = [b"", b"a", b"x" * 15, b"y" * 16, "日本語".encode() * 50]
+    blobs = [ctx.encrypt(p, iv) for p in plains]
+    assert ctx.decrypt_many(blobs, iv) == plains
+    assert [ctx.decrypt(b, iv) for b in blobs] == plains
+
+
+def test_string_round_trips():
+    key, iv = b"0123456789abcdef0123456789abcdef", bytes(16)
+    text = "Mail_List 受信箱"
+    assert AESService.DecryptStringFromBytes_Aes(AESService.EncryptStringToBytes_Aes(text, key, iv), key, iv) == text
+    assert StringCipher.Decrypt(StringCipher.Encrypt(text, "pass"), "pass") == text
+
+
+def test_aes256_string_helpers_refuse_until_verified():
+    with pytest.raises(NotImplementedError, match="no client test vectors"):
+        StringCipher.AESEncrypt256("x", "k" * 32)
+    with pytest.raises(NotImplementedError, match="no client test vectors"):
+        StringCipher.AESDecrypt256("eA==", "k" * 32)
+    with pytest.raises(NotImplementedError, match="no client test vectors"):
+        StringCipher.AESDecrypt256Many(["eA=="], "k" * 32)
+
+
+def test_module_constants_are_not_usable_as_is():
+    with pytest.raises(ValueError, match="key must be"):
+        AESService.EncryptStringToBytes_Aes("x", AESService.AESKey, AESService.AESIV)
+    with pytest.raises(ValueError, match="IV must be"):
+        AESService.EncryptStringToBytes_Aes("x", NIST_KEY, AESService.AESIV)
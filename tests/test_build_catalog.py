@@ -0,0 +1,145 @@
+import io
+import json
+import random
+import sqlite3
+import zipfile
+
+import pytest
+
+import build_catalog
+
+
+def write_zip(path, tables):
+    with zipfile.ZipFile(path, "w") as zf:
+        for name, rows in tables.items():
+            zf.writestr(name, json.dumps(rows))
+
+
+def contents(db):
+    con = sqlite3.connect(db)
+    try:
+        return (con.execute("SELECT * FROM entity ORDER BY 1, 2").fetchall(),
+                con.execute("SELECT * FROM entity_alias ORDER BY 1, 4").fetchall())
+    finally:
+        con.close()
+
+
+def build(zip_path, db, **kw):
+    build_catalog.build(zip_path, db, workers=1, snapshot=None, rebuild_ratio=1.0, **kw)
+    return contents(db)
+
+
+def assert_incremental_matches_full(tmp_path, versions, **kw):
+    inc = tmp_path / "inc.sqlite"
+    for n, tables in enumerate(versions):
+        zip_path = tmp_path / f"v{n}.zip"
+        write_zip(zip_path, tables)
+        full = build(zip_path, tmp_path / f"full{n}.sqlite", full=True, **kw)
+        assert build(zip_path, inc, **kw) == full, f"version {n}"
+
+
+def test_freed_alias_goes_to_next_claimant(tmp_path):
+    v1 = {"Excel/ItemAExcel.json": [{"Id": 1, "Name": "Gem"}],
+          "Excel/ItemBExcel.json": [{"Id": 2, "Name": "Gem"}]}
+    v2 = {"Excel/ItemAExcel.json": [{"Id": 1, "Name": "Ruby"}],
+          "Excel/ItemBExcel.json": [{"Id": 2, "Name": "Gem"}]}
+    assert_incremental_matches_full(tmp_path, [v1, v2])
+    _, aliases = contents(tmp_path / "inc.sqlite")
+    assert sorted((a[1], a[3]) for a in aliases) == [(1, "ruby"), (2, "gem")]
+
+
+def random_tables(rng, names):
+    tables = {}
+    for table in ("Excel/CharacterExcel.json", "Excel/CharacterStatExcel.json",
+                  "Excel/ItemExcel.json", "Excel/ItemExtraExcel.json", "Excel/CurrencyExcel.json"):
+        if rng.random() < 0.1:
+            continue
+        rows = []
+        for _ in range(rng.randrange(0, 25)):
+            row = {"Id": rng.randrange(1, 30), "Name": rng.choice(names)}
+            if rng.random() < 0.5:
+                row["DevName"] = rng.choice(names)
+            if rng.random() < 0.3:
+                row["NameJp"] = rng.choice(names)
+            if rng.random() < 0.5:
+                row["Rarity"] = rng.randrange(1, 4)
+            rows.append(row)
+        tables[table] = {"Rows": rows} if rng.random() < 0.5 else rows
+    return tables
+
+
+def mutate(rng, tables, names):
+    tables = {k: json.loads(json.dumps(v)) for k, v in tables.items()}
+    for table in list(tables):
+        if rng.random() < 0.4:
+            rows = tables[table]["Rows"] if isinstance(tables[table], dict) else tables[table]
+            for row in rows:
+                if rng.random() < 0.3:
+                    row["Name"] = rng.choice(names)
+            if rows and rng.random() < 0.3:
+                rows.pop(rng.randrange(len(rows)))
+        if rng.random() < 0.05:
+            del tables[table]
+    return tables
+
+
+def test_incremental_matches_full_on_random_changes(tmp_path):
+    rng = random.Random(7)
+    names = ["Gem", "gem", "Ruby", "Shiroko", "Hoshino", "Aru", "Mutsuki", "Kayoko", "Haruka", "Serika"]
+    versions = [random_tables(rng, names)]
+    for _ in range(12):
+        versions.append(mutate(rng, versions[-1], names))
+    assert_incremental_matches_full(tmp_path, versions)
+
+
+def test_streamed_members_match_parsed_ones(tmp_path):
+    # stream_threshold=0 sends every member through JSONRowStream, in full
+    # and incremental builds alike
+    rng = random.Random(11)
+    names = ["Gem", "Ruby", "Shiroko", "Hoshino", "Aru"]
+    versions = [random_tables(rng, names)]
+    for _ in range(6):
+        versions.append(mutate(rng, versions[-1], names))
+    assert_incremental_matches_full(tmp_path, versions, stream_threshold=0)
+    parsed = build(tmp_path / f"v{len(versions) - 1}.zip", tmp_path / "parsed.sqlite", full=True)
+    assert contents(tmp_path / "inc.sqlite") == parsed
+
+
+@pytest.mark.parametrize("doc", [
+    '[12345, -1.25e-3, 3.5, 1E+10, 0, -0.5, true, null, "1.5", {"a": 1.5}, [2e3], 7]',
+    '{"Version": 1.25e5, "Rows": [1.5, -2e-2, {"Id": 3, "Name": "G\\u00e9m"}], "T": -4.75}',
+])
+def test_row_stream_matches_json_loads_at_every_chunk_size(doc):
+    expected = json.loads(doc)
+    if isinstance(expected, dict):
+        expected = expected["Rows"]
+    for chunk_size in range(1, len(doc) + 1):
+        rows = list(build_catalog.JSONRowStream(io.StringIO(doc), chunk_size=chunk_size))
+        assert rows == expected, f"chunk_size={chunk_size}"
+
+
+def test_undecodable_rows_are_kept_and_counted(tmp_path, capsys):
+    from lib import TableEncryptionService as TES
+    key = TES.CreateKey("Id")
+    rows = [{"Id": TES.ConvertLong(1, key), "Name": "Gem"},
+            {"Id": "not a number", "Name": "Ruby"},    # struct.error
+            {"Id": [2], "Name": "Shiroko"},
+            {"Name": "Aru"}]
+    zip_path = tmp_path / "t.zip"
+    write_zip(zip_path, {"Excel/ItemExcel.json": {"DataList": rows}})
+    decoder = build_catalog.SchemaDecoder({"Id": "long"})
+    with zipfile.ZipFile(zip_path) as zf:
+        entities, _ = build_catalog.parse_member(zf, "Excel/ItemExcel.json", decoder, ("DataList",))
+    assert [(e[1], e[2]) for e in entities] == [(1, "Gem")]
+    assert decoder.undecoded == 3
+    assert "3/4 rows kept as stored" in capsys.readouterr().err
+
+
+
+def test_decoders_are_not_shared_across_schemas(tmp_path):
+    long_id = build_catalog.Bundle(tmp_path / "a.zip", True, (("ItemExcel", (("Id", "long"),)),))
+    raw_id = build_catalog.Bundle(tmp_path / "b.zip", True, (("ItemExcel", (("Id", "raw"),)),))
+    decoder = long_id.decoder("Excel/ItemExcel.json")
+    assert decoder is long_id.decoder("Other/ItemExcel.json")
+    assert raw_id.decoder("Excel/ItemExcel.json") is not decoder
+    assert build_catalog.Bundle(tmp_path / "c.zip", True).decoder("Excel/ItemExcel.json") is None
@@ -0,0 +1,53 @@
+import json
+
+import build_catalog
+from test_build_catalog import write_zip
+
+OLD = {"Excel/CharacterExcel.json": [
+    {"Id": 1, "Name": "Shiroko", "Rarity": 3, "Hp": 100},
+    {"Id": 2, "Name": "Hoshino", "Rarity": 2},
+    {"Id": 3, "Name": "Aru"},
+]}
+NEW = {"Excel/CharacterExcel.json": [
+    {"Id": 1, "Name": "Shiroko", "Rarity": 3, "Hp": 120},     # meta only
+    {"Id": 2, "Name": "Hoshino", "DevName": "CH0063", "Rarity": 3},
+    {"Id": 4, "Name": "Mutsuki"},
+]}
+
+
+def catalogs(tmp_path):
+    paths = []
+    for name, tables in (("old", OLD), ("new", NEW)):
+        write_zip(tmp_path / f"{name}.zip", tables)
+        build_catalog.build(tmp_path / f"{name}.zip", tmp_path / f"{name}.sqlite", workers=1, snapshot=None)
+        paths.append(tmp_path / f"{name}.sqlite")
+    return paths
+
+
+def test_diff_catalogs(tmp_path):
+    old, new = catalogs(tmp_path)
+    changes = build_catalog.diff_catalogs(old, new)
+    assert changes["summary"] == {"added": 1, "removed": 1, "changed": 2, "unchanged": 0}
+    assert [(e["entity_id"], e["name"]) for e in changes["added"]] == [(4, "Mutsuki")]
+    assert [(e["entity_id"], e["name"]) for e in changes["removed"]] == [(3, "Aru")]
+    assert [(e["entity_id"], e["fields"]) for e in changes["changed"]] == [
+        (1, ["meta"]), (2, ["dev_name", "rarity"])]
+    assert [e["old_meta_hash"] != e["new_meta_hash"] for e in changes["changed"]] == [True, False]
+    assert changes["old"]["entities"] == changes["new"]["entities"] == 3
+
+    same = build_catalog.diff_catalogs(old, old)
+    assert same["summary"] == {"added": 0, "removed": 0, "changed": 0, "unchanged": 3}
+
+
+def test_diff_builds_zips_and_keeps_stdout_json(tmp_path, capsys):
+    old, new = catalogs(tmp_path)
+    capsys.readouterr()
+    build_catalog.diff(tmp_path / "old.zip", tmp_path / "new.zip")
+    out = json.loads(capsys.readouterr().out)
+    expected = build_catalog.diff_catalogs(old, new)
+    for key in ("summary", "added", "removed", "changed"):
+        assert out[key] == expected[key]
+    assert out["old"]["path"] == str(tmp_path / "old.zip")
+
+    build_catalog.diff(old, new, tmp_path / "diff.json")
+    assert json.loads((tmp_path / "diff.json").read_text(encoding="utf-8"))["summary"] == expected["summary"]
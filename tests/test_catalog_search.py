@@ -0,0 +1,66 @@
+import json
+import zipfile
+
+import pytest
+
+import build_catalog
+from catalog_search import CatalogSearch
+
+TABLES = {
+    "Excel/CharacterExcel.json": [
+        {"Id": 1, "Name": "Shiroko", "DevName": "CH0066"},
+        {"Id": 2, "Name": "Shiroko (Riding)"},
+        {"Id": 3, "Name": "Swimsuit Shiroko"},
+        {"Id": 4, "Name": "Hoshino", "NameJp": "ホシノ"},
+    ],
+    "Excel/ItemExcel.json": [{"Id": 1, "Name": "Shiroko Figure"}],
+}
+
+
+@pytest.fixture(scope="module", params=[True, False], ids=["indexed", "like"])
+def catalog(request, tmp_path_factory):
+    tmp = tmp_path_factory.mktemp("search")
+    with zipfile.ZipFile(tmp / "t.zip", "w") as zf:
+        for name, rows in TABLES.items():
+            zf.writestr(name, json.dumps(rows))
+    build_catalog.build(tmp / "t.zip", tmp / "c.sqlite", workers=1, snapshot=None, search=request.param)
+    with CatalogSearch(tmp / "c.sqlite") as cs:
+        assert cs.indexed == request.param
+        yield cs
+
+
+def hits(matches):
+    return [(m.entity_type, m.entity_id, m.tier) for m in matches]
+
+
+def test_tiers_rank_exact_prefix_substring(catalog):
+    assert hits(catalog.search("shiroko")) == [
+        (1, 1, "exact"), (3, 1, "prefix"), (1, 2, "prefix"), (1, 3, "substring")]
+    assert catalog.search("SHIROKO")[0].score == 1.0
+
+
+def test_entity_type_and_limit(catalog):
+    assert hits(catalog.search("shiroko", entity_type=3)) == [(3, 1, "prefix")]
+    assert hits(catalog.search("shiroko", limit=2)) == [(1, 1, "exact"), (3, 1, "prefix")]
+    assert catalog.search("shiroko", limit=0) == [] and catalog.search("   ") == []
+
+
+def test_dev_names_and_aliases_resolve_to_canonical_name(catalog):
+    [m] = catalog.search("ch0066")
+    assert (m.canonical_name, m.matched, m.kind, m.tier) == ("Shiroko", "CH0066", "dev_name", "exact")
+    [m] = catalog.search("ホシノ")
+    assert (m.entity_id, m.canonical_name, m.kind) == (4, "Hoshino", "alias")
+
+
+def test_short_queries_match_prefixes_only(catalog):
+    assert hits(catalog.search("ho")) == [(1, 4, "prefix")]
+
+
+def test_fuzzy_needs_the_index(catalog):
+    matches = catalog.search("Shirokko")
+    if not catalog.indexed:
+        assert matches == []
+        return
+    assert matches[0].tier == "fuzzy" and matches[0].entity_id == 1
+    assert all(m.tier == "fuzzy" and m.score >= catalog.fuzzy_threshold for m in matches)
+    assert catalog.search("Shirokko", fuzzy=False) == []
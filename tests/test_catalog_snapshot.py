@@ -0,0 +1,69 @@
+import json
+import sqlite3
+import zipfile
+
+import pytest
+
+import build_catalog
+from lib.CatalogSnapshot import NO_RARITY, CatalogEntry, CatalogSnapshot, WriteCatalogSnapshot
+
+ROWS = [
+    (3, 10, "Gem", None, None),
+    (1, 20, "Shiroko", "CH0066", 3),
+    (1, 5, "Hoshino", None, 2),
+    (1, 2**40, "日本語", "dev 名", NO_RARITY + 1),
+    (2, 1, "", None, 0),
+]
+
+
+@pytest.fixture
+def snapshot(tmp_path):
+    path = tmp_path / "catalog.bin"
+    assert WriteCatalogSnapshot(path, ROWS, "2026-01-02 03:04:05") == len(ROWS)
+    with CatalogSnapshot(path) as snap:
+        yield snap
+
+
+def test_entries_round_trip_in_key_order(snapshot):
+    assert snapshot.built_at == "2026-01-02 03:04:05"
+    assert list(snapshot) == [CatalogEntry(*row) for row in sorted(ROWS, key=lambda r: (r[0], r[1]))]
+    assert snapshot[1] == CatalogEntry(1, 20, "Shiroko", "CH0066", 3)
+    with pytest.raises(IndexError):
+        snapshot[len(ROWS)]
+
+
+def test_lookups(snapshot):
+    assert snapshot.get(1, 5).name == "Hoshino"
+    assert snapshot.get(3, 10) == CatalogEntry(3, 10, "Gem", None, None)
+    assert snapshot.get(1, 10) is None and snapshot.get(4, 1) is None
+    assert (1, 2**40) in snapshot and (3, 20) not in snapshot
+    assert [e.entity_id for e in snapshot.entities(1)] == [5, 20, 2**40]
+    assert snapshot.type_range(9) == range(5, 5)
+
+
+def test_empty_snapshot(tmp_path):
+    path = tmp_path / "empty.bin"
+    assert WriteCatalogSnapshot(path, []) == 0
+    with CatalogSnapshot(path) as snap:
+        assert len(snap) == 0 and list(snap) == [] and snap.built_at == ""
+        assert snap.get(1, 1) is None and list(snap.entities(1)) == []
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / "bogus.bin"
+    path.write_bytes(b"SQLite format 3\0" + bytes(64))
+    with pytest.raises(ValueError, match="not a format 1"):
+        CatalogSnapshot(path)
+
+
+def test_build_writes_snapshot_of_catalog(tmp_path):
+    with zipfile.ZipFile(tmp_path / "t.zip", "w") as zf:
+        zf.writestr("Excel/CharacterExcel.json", json.dumps([{"Id": 2, "Name": "Aru", "Rarity": 3},
+                                                             {"Id": 1, "Name": "Mutsuki", "DevName": "CH0001"}]))
+    build_catalog.build(tmp_path / "t.zip", tmp_path / "c.sqlite", workers=1, snapshot=tmp_path / "c.bin")
+    con = sqlite3.connect(tmp_path / "c.sqlite")
+    rows = con.execute("SELECT entity_type, entity_id, canonical_name, dev_name, rarity FROM entity ORDER BY 1, 2").fetchall()
+    built_at = con.execute("SELECT v FROM meta WHERE k='built_at'").fetchone()[0]
+    con.close()
+    with CatalogSnapshot(tmp_path / "c.bin") as snap:
+        assert list(snap) == [CatalogEntry(*row) for row in rows] and snap.built_at == built_at
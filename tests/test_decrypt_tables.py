@@ -0,0 +1,25 @@
+import pytest
+
+from decrypt_tables import decode_rows, member_path
+from lib import TableEncryptionService as TES
+
+
+def test_decode_rows_keeps_document_shape():
+    key = TES.CreateKey("Id")
+    payload = {"Version": 7, "DataList": [
+        {"Id": TES.ConvertLong(1, key), "Hp": 10, "Tags": [1, 2]},
+        {"Hp": 5},
+    ]}
+    assert decode_rows(payload, TES.CompileRowDecoder({"Id": "long"})) == (2, 1)
+    assert payload == {"Version": 7, "DataList": [{"Id": 1, "Hp": 10, "Tags": [1, 2]}, {"Hp": 5}]}
+
+
+def test_decode_rows_without_row_array():
+    assert decode_rows({"Version": 1}, TES.CompileRowDecoder({"Id": "long"})) is None
+
+
+def test_member_path_stays_inside_out_dir(tmp_path):
+    assert member_path(tmp_path, "Excel/ItemExcel.json") == tmp_path.resolve() / "Excel" / "ItemExcel.json"
+    for name in ("../evil.json", "Excel/../../evil.json", "/etc/evil.json", ""):
+        with pytest.raises(ValueError):
+            member_path(tmp_path, name)
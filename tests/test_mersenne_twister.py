@@ -0,0 +1,55 @@
+import hashlib
+
+import pytest
+
+from lib.MersenneTwister import MersenneTwister
+
+# Digests of the pure-Python implementation this class replaced; the table
+# keys are derived from this stream, so any drift breaks decryption.
+#   seed -> (first 8 NextBytes, sha1 of the mixed call sequence below)
+EXPECTED = {
+    0: ("56853f461755e24b", "1e8b29607a072fbf99cd5843ea92b396f8a92b54"),
+    5489: ("aedd48687b4f5711", "0e4feda6e57d57c3e02cdd0875d7ed8f35e2e18b"),
+    2**32 - 1: ("d1347f0c9120490e", "e1b513fedd5da2cbdf498863148c5ad80b700e1a"),
+    -1: ("d1347f0c9120490e", "e1b513fedd5da2cbdf498863148c5ad80b700e1a"),
+    -12345: ("4dfb97592384b232", "863ad8e55a0b7fd9cf696367f55df1f96e8d527f"),
+    2**40 + 7: ("5778c4096272191d", "909dc2e205a6c5b29358c44ecafcf74a1eb78f6d"),
+}
+
+
+def mixed_calls(mt):
+    out = [mt.NextBytes(3000)]  # crosses the 624-word (2496-byte) block
+    out.append(str(mt.Next()).encode())
+    out.append(str(mt.genrand_int32()).encode())
+    out.append(mt.NextBytes(7))
+    out.append(str(mt.Next(10, 100)).encode())
+    out.append(mt.NextBytes(5000))
+    out.extend(str(mt.genrand_int32()).encode() for _ in range(700))
+    out.append(mt.NextBytes(1))
+    return hashlib.sha1(b"|".join(out)).hexdigest()
+
+
+@pytest.mark.parametrize("seed", EXPECTED)
+def test_stream_matches_reference(seed):
+    head, digest = EXPECTED[seed]
+    assert MersenneTwister(seed).NextBytes(8).hex() == head
+    assert mixed_calls(MersenneTwister(seed)) == digest
+
+
+@pytest.mark.parametrize("split", [4, 2492, 2496, 2500, 4992])
+def test_next_bytes_is_independent_of_request_sizes(split):
+    # each call consumes whole words, so only word-aligned splits concatenate
+    whole = MersenneTwister(5489).NextBytes(6000)
+    mt = MersenneTwister(5489)
+    assert mt.NextBytes(split) + mt.NextBytes(6000 - split) == whole
+
+
+def test_snapshot_restore_round_trip():
+    mt = MersenneTwister(42)
+    mt.NextBytes(2500)
+    state = mt.snapshot()
+    expected = mixed_calls(mt)
+
+    mt.restore(state)
+    assert mixed_calls(mt) == expected
+    assert mixed_calls(MersenneTwister.from_snapshot(state)) == expected
@@ -0,0 +1,61 @@
+import io
+
+import pytest
+
+from lib import StringCipher
+
+TEXT = "Mail_List 受信箱 " + "日本語のテキスト" * 40 + " end"
+
+
+@pytest.fixture(scope="module")
+def wire():
+    return StringCipher.Encrypt(TEXT, "pass")
+
+
+def wrap(text, width=76):
+    return "\n".join(text[i : i + width] for i in range(0, len(text), width)) + "\n"
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 4, 5, 16, 1000])
+def test_decrypt_stream_matches_decrypt(wire, chunk_size):
+    data = b"".join(StringCipher.DecryptStream(wire, "pass", chunk_size))
+    assert data.decode("utf8") == StringCipher.Decrypt(wire, "pass") == TEXT
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 4, 5, 16, 1000])
+def test_decrypt_stream_wrapped_base64(wire, chunk_size):
+    wrapped = wrap(wire)
+    assert b"".join(StringCipher.DecryptStream(io.StringIO(wrapped), "pass", chunk_size)).decode("utf8") == TEXT
+    lines = io.StringIO(wrapped).readlines()
+    assert "".join(StringCipher.DecryptStreamText(lines, "pass")) == TEXT
+
+
+def cut_mid_character(data):
+    try:
+        data.decode("utf8")
+    except UnicodeDecodeError:
+        return True
+    return False
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 4, 5, 16, 1000])
+def test_decrypt_stream_text_multibyte_across_blocks(wire, chunk_size):
+    # 3-byte characters after a 20-byte prefix straddle the 16-byte blocks
+    blocks = list(StringCipher.DecryptStream(wire, "pass", chunk_size))
+    if len(blocks) > 1:
+        assert any(cut_mid_character(b"".join(blocks[: i + 1])) for i in range(len(blocks) - 1))
+    pieces = list(StringCipher.DecryptStreamText(wire, "pass", chunk_size))
+    assert "".join(pieces) == TEXT
+    assert all("�" not in piece for piece in pieces)
+
+
+def test_load_encrypted_data_file_stream(tmp_path, wire):
+    path = tmp_path / "data.txt"
+    path.write_text(wrap(wire), encoding="utf-8-sig")
+    assert "".join(StringCipher.LoadEncryptedDataFileStream(str(path), "pass", 7)) == TEXT
+    assert StringCipher.LoadEncryptedDataFile(str(path), "pass") == TEXT
+
+
+def test_decrypt_stream_rejects_truncated_header():
+    with pytest.raises(ValueError, match="shorter than salt"):
+        list(StringCipher.DecryptStream("AAAA", "pass"))
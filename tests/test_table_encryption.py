@@ -0,0 +1,22 @@
+import pytest
+
+from lib import TableEncryptionService as TES
+
+
+def test_convert_strings_reports_undecodable_bytes_cells():
+    key = TES.CreateKey("Name")
+    cells = [TES.EncryptString("Shiroko Sunaookami", key), b"\x80abc", "plain"]
+    values, failed = TES.ConvertStrings(cells, key)
+    assert values[0] == "Shiroko Sunaookami"
+    assert values[1] == "�abc"
+    assert failed == [1, 2]
+
+
+@pytest.mark.parametrize("column", ["class", "None", "self", "1st"])
+def test_record_decoder_rejects_keyword_columns(column):
+    with pytest.raises(ValueError, match=repr(column)):
+        TES.CompileRowDecoder({column: "int"}, record=True)
+
+
+def test_tuple_decoder_accepts_keyword_columns():
+    assert TES.CompileRowDecoder({"class": "raw"}).decode({"class": 5}) == (5,)
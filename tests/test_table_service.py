@@ -0,0 +1,12 @@
+import gc
+
+import pytest
+
+from lib.TableService import MappedTableZipFile
+
+
+def test_mapped_zip_missing_file_raises_cleanly(tmp_path, capsys):
+    with pytest.raises(FileNotFoundError):
+        MappedTableZipFile(str(tmp_path / "missing.zip"))
+    gc.collect()
+    assert "AttributeError" not in capsys.readouterr().err
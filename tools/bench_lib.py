@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+import argparse, io, json, platform, random, struct, sys, timeit, zlib
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+
+from lib import StringCipher, TableEncryptionService as TES, XXHashService
+from lib.AESEncryptionService import GetContext
+from lib.MersenneTwister import MersenneTwister
+from lib.TableService import TableZipFile
+
+# Benchmarks for the lib crypto/decoding primitives on synthetic fixtures.
+# Every case reports ops/sec and MB/sec; the JSON written to --out (or stdout)
+# is meant to be diffed between runs when an engine is swapped.
+
+SIZES = [64, 4096, 1 << 16, 1 << 20]
+QUICK_SIZES = [64, 4096, 1 << 16]
+
+# -------- fixtures --------
+
+def _crc_table():
+    table = []
+    for i in range(256):
+        c = i
+        for _ in range(8):
+            c = (c >> 1) ^ 0xEDB88320 if c & 1 else c >> 1
+        table.append(c)
+    return table
+
+def zipcrypto_encrypt(data: bytes, pwd: bytes, check: int, rng: random.Random) -> bytes:
+    # traditional PKWARE encryption, enough to produce TableZipFile fixtures
+    table = _crc_table()
+    k = [0x12345678, 0x23456789, 0x34567890]
+    def update(c):
+        k[0] = table[(k[0] ^ c) & 0xFF] ^ (k[0] >> 8)
+        k[1] = ((k[1] + (k[0] & 0xFF)) * 134775813 + 1) & 0xFFFFFFFF
+        k[2] = table[(k[2] ^ (k[1] >> 24)) & 0xFF] ^ (k[2] >> 8)
+    for c in pwd:
+        update(c)
+    out = bytearray()
+    for c in bytes(rng.randrange(256) for _ in range(11)) + bytes([check]) + data:
+        t = k[2] | 2
+        out.append(c ^ (((t * (t ^ 1)) >> 8) & 0xFF))
+        update(c)
+    return bytes(out)
+
+def write_table_zip(path: Path, members: dict, rng: random.Random):
+    # stored, ZipCrypto-encrypted members with the password TableZipFile derives
+    pwd = str(XXHashService.CalculateHash(path.name)).encode()
+    buf, central = io.BytesIO(), io.BytesIO()
+    for name, data in members.items():
+        crc = zlib.crc32(data)
+        enc = zipcrypto_encrypt(data, pwd, crc >> 24, rng)
+        fname = name.encode()
+        offset = buf.tell()
+        buf.write(struct.pack("<4s2B4HL2L2H", b"PK\003\004", 20, 0, 1, 0, 0, 0x21, crc, len(enc), len(data), len(fname), 0))
+        buf.write(fname + enc)
+        central.write(struct.pack("<4s4B4HL2L5H2L", b"PK\001\002", 20, 0, 20, 0, 1, 0, 0, 0x21, crc, len(enc), len(data),
+                                  len(fname), 0, 0, 0, 0, 0, offset))
+        central.write(fname)
+    cd = central.getvalue()
+    end = struct.pack("<4s4H2LH", b"PK\005\006", 0, 0, len(members), len(members), len(cd), buf.tell(), 0)
+    path.write_bytes(buf.getvalue() + cd + end)
+
+def encrypt_data_file(text: str, pwd: str, rng: random.Random) -> str:
+    from base64 import b64encode
+    from Crypto.Cipher import AES
+    from Crypto.Util.Padding import pad
+    salt, iv = rng.randbytes(16), rng.randbytes(16)
+    key = StringCipher._DeriveKey(pwd, salt)
+    return b64encode(salt + iv + AES.new(key=key, iv=iv, mode=AES.MODE_CBC).encrypt(pad(text.encode(), 16))).decode()
+
+# -------- harness --------
+
+def measure(fn, min_time: float):
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    number = max(1, int(number * min_time / 0.2))
+    return number, min(timer.repeat(repeat=3, number=number)) / number
+
+def run(sizes, min_time: float, only: str, workdir: Path):
+    rng = random.Random(1234)
+    key = TES.CreateKey("BenchColumn")
+    results = []
+
+    def case(primitive, size, nbytes, fn):
+        if only and only not in primitive:
+            return
+        number, secs = measure(fn, min_time)
+        r = {"primitive": primitive, "size": size, "ops_per_sec": 1 / secs,
+             "mb_per_sec": nbytes / secs / 1e6, "seconds_per_op": secs, "iterations": number}
+        results.append(r)
+        print(f"{primitive:<34} {size:>9} {r['ops_per_sec']:>14.1f} ops/s {r['mb_per_sec']:>10.2f} MB/s", file=sys.stderr)
+
+    for n in sizes:
+        case("MersenneTwister.NextBytes", n, n, lambda n=n: MersenneTwister(n).NextBytes(n))
+        data = rng.randbytes(n)
+        case("TableEncryptionService._XOR", n, n, lambda d=data: TES._XOR(d, key))
+        case("TableEncryptionService._XOR/inplace", n, n, lambda b=bytearray(data): TES._XOR(b, key))
+        case("TableEncryptionService.XOR", n, n, lambda d=data: TES.XOR("BenchTable", d))
+        case("TableEncryptionService.XOR/nocache", n, n, lambda d=data: TES.XOR("BenchTable", d, cache=False))
+
+    # numeric columns: size = rows
+    for rows in [1, 1000, 100000]:
+        ints = np.array([rng.randrange(-2**31, 2**31) for _ in range(rows)], dtype=np.int32)
+        longs = np.array([rng.randrange(-2**63, 2**63) for _ in range(rows)], dtype=np.int64)
+        il, ll = ints.tolist(), longs.tolist()
+        if rows <= 1000:
+            case("ConvertInt", rows, 4 * rows, lambda v=il: [TES.ConvertInt(x, key) for x in v])
+            case("ConvertLong", rows, 8 * rows, lambda v=ll: [TES.ConvertLong(x, key) for x in v])
+            case("ConvertFloat", rows, 4 * rows, lambda v=il: [TES.ConvertFloat(x, key) for x in v])
+        case("ConvertInts", rows, 4 * rows, lambda v=ints: TES.ConvertInts(v, key))
+        case("ConvertLongs", rows, 8 * rows, lambda v=longs: TES.ConvertLongs(v, key))
+        case("ConvertFloats", rows, 4 * rows, lambda v=ints: TES.ConvertFloats(v, key))
+
+    # string columns: size = rows of 16-char strings
+    for rows in [1, 1000, 20000]:
+        cells = [TES.EncryptString("".join(rng.choices("abcdefghijklmnop", k=16)), key) for _ in range(rows)]
+        nbytes = sum(len(c) for c in cells)
+        if rows <= 1000:
+            case("ConvertString", rows, nbytes, lambda v=cells: [TES.ConvertString(x, key) for x in v])
+        case("ConvertStrings", rows, nbytes, lambda v=cells: TES.ConvertStrings(v, key))
+
+    for n in sizes:
+        text = "".join(rng.choices("abcdefghijklmnopqrstuvwxyz{}:,\"", k=n))
+        blob = encrypt_data_file(text, "bench", rng)
+        case("StringCipher.Decrypt", n, n, lambda b=blob: StringCipher.Decrypt(b, "bench"))
+        case("StringCipher.Decrypt/cold-kdf", n, n,
+             lambda b=blob: (StringCipher._DeriveKey.cache_clear(), StringCipher.Decrypt(b, "bench")))
+        case("StringCipher.DecryptStream", n, n, lambda b=blob: b"".join(StringCipher.DecryptStream(b, "bench")))
+        ctx, iv = GetContext(b"k" * 32), bytes(16)
+        blobs = [ctx.encrypt(rng.randbytes(n // 16), iv) for _ in range(16)]
+        case("AESContext.decrypt_many", n, sum(map(len, blobs)), lambda b=blobs: ctx.decrypt_many(b, iv))
+
+    zip_path = workdir / "BenchTableBundles.zip"
+    members = {f"Bench{n}.bytes": rng.randbytes(n) for n in sizes}
+    write_table_zip(zip_path, members, rng)
+    with TableZipFile(str(zip_path)) as zf:
+        for name, data in members.items():
+            case("TableZipFile.open", len(data), len(data), lambda name=name: zf.open(name).read())
+
+    return results
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--out", help="Write JSON results here instead of stdout")
+    ap.add_argument("--quick", action="store_true", help="Skip the 1 MiB cases and use shorter timings")
+    ap.add_argument("--min-time", type=float, default=0.2, help="Target seconds per timing repeat")
+    ap.add_argument("--only", default="", help="Only run primitives whose name contains this")
+    ap.add_argument("--workdir", default=None, help="Where to write fixture files (default: temp dir)")
+    args = ap.parse_args()
+
+    import tempfile
+    with tempfile.TemporaryDirectory() as tmp:
+        results = run(QUICK_SIZES if args.quick else SIZES, 0.05 if args.quick else args.min_time,
+                      args.only, Path(args.workdir) if args.workdir else Path(tmp))
+    report = {
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.out:
+        Path(args.out).write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
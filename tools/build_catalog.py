@@ -1,5 +1,7 @@
 #!/usr/bin/env python3
-import argparse, json, re, sqlite3, zipfile, io
+import argparse, contextlib, hashlib, json, os, re, sqlite3, struct, sys, tempfile, zipfile, io
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
 from pathlib import Path
 
 # -------- helpers --------
@@ -38,12 +40,592 @@ def pick(d: dict, keys: list[str], default=None):
             return d[k]
     return default
 
+# -------- column plans --------
+
+ALIAS_KEY_RE = re.compile(r"^(Name|NAME)[A-Za-z]*$")
+
+@dataclass(frozen=True)
+class KeySpec:
+    # candidate columns per role, in priority order; give an entity type its
+    # own spec in TYPE_SPECS when its tables name things differently
+    ids: tuple = tuple(ID_KEYS)
+    names: tuple = tuple(NAME_KEYS)
+    devnames: tuple = tuple(DEVNAME_KEYS)
+    rarities: tuple = tuple(RARITY_KEYS)
+    alias_re: re.Pattern = ALIAS_KEY_RE
+
+DEFAULT_SPEC = KeySpec()
+TYPE_SPECS: dict[int, KeySpec] = {}
+
+class ColumnPlan:
+    # Role of every column for one key layout (tuple of row keys), computed
+    # once and reused for each row with that layout: only the columns that
+    # exist are probed, and meta/alias columns are a fixed projection.
+    def __init__(self, keys: tuple, spec: KeySpec = DEFAULT_SPEC):
+        present = set(keys)
+        self.ids = [k for k in spec.ids if k in present]
+        self.names = [k for k in spec.names if k in present]
+        self.devnames = [k for k in spec.devnames if k in present]
+        self.rarities = [k for k in spec.rarities if k in present]
+        special = set(spec.ids + spec.names + spec.devnames + spec.rarities)
+        self.aliases = [k for k in keys if isinstance(k, str) and spec.alias_re.match(k)]
+        self.meta = [k for k in keys if k not in special]
+
+    def project(self, row: dict, etype: int, stem: str):
+        # (entity row, alias rows) for one table row, or None without a usable id
+        _id = pick(row, self.ids)
+        if _id is None:
+            return None
+        try:
+            _id = int(_id)
+        except Exception:
+            return None
+
+        dev  = pick(row, self.devnames)
+        name = pick(row, self.names) or dev or f"{stem}#{_id}"
+        rar  = pick(row, self.rarities)
+        meta = {k: row[k] for k in self.meta}
+        entity = (etype, _id, str(name), (str(dev) if dev else None), (int(rar) if isinstance(rar,int) or (isinstance(rar,str) and rar.isdigit()) else None), json.dumps(meta, ensure_ascii=False))
+
+        aliases = []
+        for k in self.aliases:
+            v = row[k]
+            if isinstance(v,(str,int,float)) and str(v).strip():
+                a = str(v).strip()
+                aliases.append((etype, _id, a, slug(a), None))
+        # dev name as alias
+        if dev:
+            aliases.append((etype, _id, str(dev), slug(str(dev)), None))
+        return entity, aliases
+
+class TablePlanner:
+    # ColumnPlan per distinct key layout of one table; rows of a table almost
+    # always share a layout, so this is a single dict hit per row
+    def __init__(self, etype: int, stem: str):
+        self.etype = etype
+        self.stem = stem
+        self.spec = TYPE_SPECS.get(etype, DEFAULT_SPEC)
+        self.plans: dict[tuple, ColumnPlan] = {}
+
+    def project(self, row: dict):
+        layout = tuple(row)
+        plan = self.plans.get(layout)
+        if plan is None:
+            plan = self.plans[layout] = ColumnPlan(layout, self.spec)
+        return plan.project(row, self.etype, self.stem)
+
+# -------- bundles --------
+
+@dataclass(frozen=True)
+class Bundle:
+    # Where members come from. A plain zip of cleartext JSON by default; with
+    # encrypted=True the official TableBundles zip, opened through TableZipFile
+    # (password from the bundle name) so members are decrypted while they are
+    # read, and columns listed in schemas ({table: {column: type}}, the format
+    # decrypt_tables.py takes) are XOR-decoded row by row before planning.
+    path: Path
+    encrypted: bool = False
+    schemas: tuple = ()            # ((table, ((column, type), ...)), ...), hashable and picklable
+    hash_index: str = None
+    name: str = None
+
+    def open(self) -> zipfile.ZipFile:
+        if not self.encrypted:
+            return zipfile.ZipFile(self.path, "r")
+        _load_lib(self.hash_index)
+        from lib.TableService import MappedTableZipFile
+        return MappedTableZipFile(str(self.path), self.name)
+
+    @property
+    def row_keys(self) -> tuple:
+        # client table dumps keep their rows under "DataList"
+        return ROW_KEYS + ("DataList",) if self.encrypted else ROW_KEYS
+
+    def decoder(self, filename: str):
+        # row -> row with the schema's columns decoded in place, or None.
+        # Compiled decoders bake in the column keys, so they are cached per
+        # schema set and hash index as well as per table.
+        table = Path(filename).stem
+        key = (self.schemas, self.hash_index, table)
+        if key not in _decoders:
+            schema = dict(self.schemas).get(table)
+            if schema is None:
+                _decoders[key] = None
+            else:
+                _load_lib(self.hash_index)
+                _decoders[key] = SchemaDecoder(dict(schema))
+        return _decoders[key]
+
+class SchemaDecoder:
+    # Rows whose schema columns are missing or hold the wrong kind of value
+    # (a number in a string column, text in an int column) are kept as
+    # stored and counted in undecoded, instead of failing the whole table.
+    ERRORS = (KeyError, TypeError, AttributeError, ValueError, struct.error)
+
+    def __init__(self, schema: dict):
+        from lib.TableEncryptionService import CompileRowDecoder
+        self.decode = CompileRowDecoder(schema).decode
+        self.columns = tuple(schema)
+        self.undecoded = 0
+
+    def __call__(self, row: dict) -> dict:
+        try:
+            row.update(zip(self.columns, self.decode(row)))
+        except self.ERRORS:
+            self.undecoded += 1
+        return row
+
+def report_undecoded(filename: str, decoder, before: int, rows: int):
+    # decoder.undecoded counts across members, so callers pass its value from
+    # before the member; workers print this themselves
+    kept = getattr(decoder, "undecoded", 0) - before
+    if kept:
+        print(f"[!] {filename}: {kept}/{rows} rows kept as stored, schema columns not decodable", file=sys.stderr)
+
+_decoders = {}
+_lib_path_added = False
+_seed_index = None
+
+def _load_lib(hash_index: str = None):
+    # puts lib/ on the path; its crypto modules need numpy, xxhash and
+    # pycryptodome, so they are only imported for encrypted bundles.
+    # The seed index is (re)loaded whenever a different one is asked for.
+    global _lib_path_added, _seed_index
+    if not _lib_path_added:
+        sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+        _lib_path_added = True
+    if hash_index and hash_index != _seed_index:
+        from lib import TableEncryptionService, XXHashService
+        TableEncryptionService.LoadSeedIndex(XXHashService.HashIndex(hash_index))
+        _seed_index = hash_index
+
+def load_schemas(path: Path) -> tuple:
+    schemas = json.loads(Path(path).read_text(encoding="utf-8"))
+    return tuple((table, tuple(schema.items())) for table, schema in schemas.items())
+
+# -------- member parsing --------
+
+# Runs in worker processes: each one opens the zip itself and sends back
+# compact (entity rows, alias rows) tuples for the single SQLite writer.
+
+ROW_KEYS = ("Rows","rows","Data","data")
+
+def parse_member(zf: zipfile.ZipFile, filename: str, decoder=None, row_keys: tuple = None):
+    etype = detect_type(filename)
+    raw = zf.read(filename).decode("utf-8","replace")
+    try:
+        data = json.loads(raw)
+    except Exception:
+        return [], []
+
+    rows = data
+    if isinstance(data, dict):
+        # sometimes tables wrap arrays under "Rows" or table name
+        for k in row_keys or ROW_KEYS:
+            if k in data and isinstance(data[k], list):
+                rows = data[k]
+                break
+
+    if not isinstance(rows, list):
+        return [], []
+
+    entities, aliases = [], []
+    planner = TablePlanner(etype, Path(filename).stem)
+    before = getattr(decoder, "undecoded", 0)
+    for row in rows:
+        if not isinstance(row, dict):
+            continue
+        if decoder is not None:
+            row = decoder(row)
+        projected = planner.project(row)
+        if projected is None:
+            continue
+        entities.append(projected[0])
+        aliases.extend(projected[1])
+    report_undecoded(filename, decoder, before, len(rows))
+    return entities, aliases
+
+_worker_zf = None
+_worker_bundle = None
+
+def _init_worker(bundle: Bundle):
+    global _worker_zf, _worker_bundle
+    _worker_zf = bundle.open()
+    _worker_bundle = bundle
+
+def _parse_in_worker(filename: str):
+    return parse_member(_worker_zf, filename, _worker_bundle.decoder(filename), _worker_bundle.row_keys)
+
+def iter_parsed(bundle: Bundle, members: list, workers: int):
+    # yields parsed members in archive order whatever order workers finish in,
+    # so later tables still win INSERT OR REPLACE like in a serial build
+    if workers <= 1 or len(members) <= 1:
+        with bundle.open() as zf:
+            for m in members:
+                yield parse_member(zf, m, bundle.decoder(m), bundle.row_keys)
+        return
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(bundle,)) as ex:
+        yield from ex.map(_parse_in_worker, members)
+
+# -------- streaming rows --------
+# Oversized tables are read as a text stream and their rows decoded one at a
+# time, so memory stays around one chunk plus one row whatever the table size.
+
+_WS = re.compile(r"[ \t\n\r]*")
+_NUMBER_TAIL = re.compile(r"[0-9.eE+-]*\Z")
+
+class JSONRowStream:
+    # Yields the row objects of a table document: the elements of a top-level
+    # array, or of the first row_keys array of a top-level object.
+    # The rest of the document is still parsed, so malformed JSON raises
+    # ValueError just like json.loads would.
+    def __init__(self, f: io.TextIOBase, chunk_size: int = 1 << 16, row_keys: tuple = ROW_KEYS):
+        self.f = f
+        self.row_keys = row_keys
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        more = self.f.read(self.chunk_size)
+        self.buf = self.buf[self.pos:] + more
+        self.pos = 0
+        self.eof = not more
+
+    def _peek(self) -> str:
+        while True:
+            self.pos = _WS.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if self.eof:
+                return ""
+            self._fill()
+
+    def _expect(self, chars: str) -> str:
+        c = self._peek()
+        if not c or c not in chars:
+            raise ValueError(f"expected one of {chars!r} at offset {self.pos}, got {c!r}")
+        self.pos += 1
+        return c
+
+    def _value(self):
+        # a number followed only by number characters up to the buffer end
+        # may be cut off ("1." decodes as 1), so read more before trusting it
+        self._peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+                number = isinstance(value, (int, float)) and not isinstance(value, bool)
+                if self.eof or not (number and _NUMBER_TAIL.match(self.buf, end)):
+                    self.pos = end
+                    return value
+            except ValueError:
+                if self.eof:
+                    raise
+            self._fill()
+
+    def _elements(self):
+        if self._peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield self._value()
+            if self._expect(",]") == "]":
+                return
+
+    def __iter__(self):
+        self._fill()
+        c = self._peek()
+        if c == "[":
+            self.pos += 1
+            yield from self._elements()
+        elif c == "{":
+            self.pos += 1
+            streamed = False
+            if self._peek() == "}":
+                self.pos += 1
+            else:
+                while True:
+                    key = self._value()
+                    self._expect(":")
+                    if not streamed and key in self.row_keys and self._peek() == "[":
+                        self.pos += 1
+                        streamed = True
+                        yield from self._elements()
+                    else:
+                        self._value()
+                    if self._expect(",}") == "}":
+                        break
+        else:
+            self._value()
+        if self._peek():
+            raise ValueError(f"extra data at offset {self.pos}")
+
+def stream_rows(zf: zipfile.ZipFile, filename: str, decoder=None, row_keys: tuple = ROW_KEYS):
+    # projected (entity row, alias rows) per table row, read off the zip
+    # stream; raises ValueError part way through a malformed table
+    planner = TablePlanner(detect_type(filename), Path(filename).stem)
+    before, count = getattr(decoder, "undecoded", 0), 0
+    with zf.open(filename) as f:
+        for row in JSONRowStream(io.TextIOWrapper(f, encoding="utf-8", errors="replace"), row_keys=row_keys):
+            count += 1
+            if not isinstance(row, dict):
+                continue
+            if decoder is not None:
+                row = decoder(row)
+            projected = planner.project(row)
+            if projected is not None:
+                yield projected
+    report_undecoded(filename, decoder, before, count)
+
+def stream_member(out: "CatalogWriter", zf: zipfile.ZipFile, filename: str, decoder=None, row_keys: tuple = ROW_KEYS,
+                  keys: set = None):
+    # rows go straight from the zip stream into the writer; the savepoint keeps
+    # the all-or-nothing behaviour of json.loads for a malformed table. With
+    # keys, only those entities are rewritten, as in CatalogWriter.extend.
+    out.flush()
+    mark = (out.added, out.alias_count)
+    out.cur.execute("SAVEPOINT member")
+    try:
+        for entity, aliases in stream_rows(zf, filename, decoder, row_keys):
+            out.extend([entity], aliases, source=filename if keys is None else None, keys=keys)
+        out.flush()
+    except ValueError:
+        out.discard()
+        out.added, out.alias_count = mark
+        out.cur.execute("ROLLBACK TO member")
+    out.cur.execute("RELEASE member")
+
+# -------- writer --------
+
+ENTITY_SQL = "INSERT OR REPLACE INTO entity(entity_type,entity_id,canonical_name,dev_name,rarity,meta_json) VALUES (?,?,?,?,?,?)"
+ALIAS_SQL  = "INSERT OR IGNORE INTO entity_alias(entity_type,entity_id,alias,alias_slug,lang) VALUES (?,?,?,?,?)"
+ALIAS_INDEX_SQL = "CREATE INDEX IF NOT EXISTS idx_alias_type_slug ON entity_alias(entity_type, alias_slug)"
+SOURCE_SQL = "INSERT OR IGNORE INTO source_entity(source,entity_type,entity_id) VALUES (?,?,?)"
+CLAIM_SQL  = "INSERT OR IGNORE INTO source_alias(source,entity_type,entity_id,alias_slug) VALUES (?,?,?,?)"
+
+# Member bookkeeping for incremental rebuilds: the CRC/size each member had
+# when it was ingested, every entity key it contributed a row to, and every
+# alias slug it claimed for an entity, including claims that lost the
+# UNIQUE(entity_type, alias_slug) race to an earlier entity.
+SOURCE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS source_file (
+  name TEXT PRIMARY KEY, crc32 INTEGER NOT NULL, size INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS source_entity (
+  source TEXT NOT NULL, entity_type INTEGER NOT NULL, entity_id INTEGER NOT NULL,
+  PRIMARY KEY (source, entity_type, entity_id)
+);
+CREATE TABLE IF NOT EXISTS source_alias (
+  source TEXT NOT NULL, entity_type INTEGER NOT NULL, entity_id INTEGER NOT NULL, alias_slug TEXT NOT NULL,
+  PRIMARY KEY (source, entity_type, entity_id, alias_slug)
+);
+CREATE INDEX IF NOT EXISTS idx_source_entity_key ON source_entity(entity_type, entity_id);
+CREATE INDEX IF NOT EXISTS idx_source_alias_key ON source_alias(entity_type, entity_id);
+CREATE INDEX IF NOT EXISTS idx_source_alias_slug ON source_alias(entity_type, alias_slug);
+CREATE INDEX IF NOT EXISTS idx_alias_entity ON entity_alias(entity_type, entity_id);
+"""
+DEFERRED_INDEXES = ("idx_alias_type_slug", "idx_source_entity_key", "idx_source_alias_key", "idx_source_alias_slug",
+                    "idx_alias_entity")
+
+# Trigram full-text index over every name an entity can be searched by
+# (canonical name, dev name, aliases), one row per distinct name and entity;
+# kind is the best role the name has (0 canonical, 1 dev name, 2 alias).
+# Queried by catalog_search.py.
+SEARCH_SCHEMA = """
+CREATE VIRTUAL TABLE entity_search USING fts5(
+  name, kind UNINDEXED, entity_type UNINDEXED, entity_id UNINDEXED,
+  tokenize = 'trigram'
+)"""
+SEARCH_FILL_SQL = """
+INSERT INTO entity_search(name, kind, entity_type, entity_id)
+SELECT name, min(kind), entity_type, entity_id FROM (
+  SELECT canonical_name AS name, 0 AS kind, entity_type, entity_id FROM entity
+  UNION ALL
+  SELECT dev_name, 1, entity_type, entity_id FROM entity WHERE dev_name IS NOT NULL
+  UNION ALL
+  SELECT alias, 2, entity_type, entity_id FROM entity_alias
+) GROUP BY name, entity_type, entity_id
+"""
+
+def build_search_index(cur: sqlite3.Cursor) -> bool:
+    # rebuilt from scratch after every build: a bulk FTS load is faster than
+    # tracking which names changed, and leaves the index fully merged
+    cur.execute("DROP TABLE IF EXISTS entity_search")
+    try:
+        cur.execute(SEARCH_SCHEMA)
+    except sqlite3.OperationalError as e:
+        # FTS5 or the trigram tokenizer (SQLite 3.34+) missing from this build
+        print(f"[!] skipping search index: {e}")
+        return False
+    cur.execute(SEARCH_FILL_SQL)
+    cur.execute("INSERT INTO entity_search(entity_search) VALUES('optimize')")
+    return True
+
+class CatalogWriter:
+    # Buffers entity/alias rows and writes them with executemany. Each table
+    # keeps its insertion order, so INSERT OR REPLACE / OR IGNORE resolve
+    # duplicates exactly like row-by-row inserts would.
+    def __init__(self, cur: sqlite3.Cursor, batch_size: int = 5000):
+        self.cur = cur
+        self.batch_size = max(1, batch_size)
+        self.entities: list[tuple] = []
+        self.aliases: list[tuple] = []
+        self.sources: list[tuple] = []
+        self.claims: list[tuple] = []
+        self.added = 0
+        self.alias_count = 0
+
+    def entity(self, row: tuple):
+        self.entities.append(row)
+        self.added += 1
+        if len(self.entities) >= self.batch_size:
+            self.flush()
+
+    def alias(self, row: tuple):
+        self.aliases.append(row)
+        self.alias_count += 1
+        if len(self.aliases) >= self.batch_size:
+            self.flush()
+
+    def extend(self, entities: list[tuple], aliases: list[tuple], source: str = None, keys: set = None):
+        # source records the member's contributions; keys limits the rows
+        # written to those (entity_type, entity_id) pairs
+        for row in entities:
+            if keys is not None and (row[0], row[1]) not in keys:
+                continue
+            if source is not None:
+                self.sources.append((source, row[0], row[1]))
+            self.entity(row)
+        for row in aliases:
+            if keys is not None and (row[0], row[1]) not in keys:
+                continue
+            if source is not None:
+                self.claims.append((source, row[0], row[1], row[3]))
+            self.alias(row)
+
+    def discard(self):
+        self.entities.clear()
+        self.aliases.clear()
+        self.sources.clear()
+        self.claims.clear()
+
+    def flush(self):
+        if self.entities:
+            self.cur.executemany(ENTITY_SQL, self.entities)
+            self.entities.clear()
+        if self.aliases:
+            self.cur.executemany(ALIAS_SQL, self.aliases)
+            self.aliases.clear()
+        if self.sources:
+            self.cur.executemany(SOURCE_SQL, self.sources)
+            self.sources.clear()
+        if self.claims:
+            self.cur.executemany(CLAIM_SQL, self.claims)
+            self.claims.clear()
+
 # -------- main build --------
 
-def build(zip_path: Path, out_sqlite: Path):
+INCREMENTAL_SCHEMA = """
+CREATE TEMP TABLE IF NOT EXISTS affected (entity_type INTEGER, entity_id INTEGER, PRIMARY KEY (entity_type, entity_id));
+CREATE TEMP TABLE IF NOT EXISTS affected_slug (entity_type INTEGER, alias_slug TEXT, PRIMARY KEY (entity_type, alias_slug));
+CREATE TEMP TABLE IF NOT EXISTS new_claim (entity_type INTEGER, entity_id INTEGER, alias_slug TEXT);
+CREATE INDEX IF NOT EXISTS temp.idx_new_claim_key ON new_claim(entity_type, entity_id);
+CREATE INDEX IF NOT EXISTS temp.idx_new_claim_slug ON new_claim(entity_type, alias_slug);
+DELETE FROM affected;
+DELETE FROM affected_slug;
+DELETE FROM new_claim;
+"""
+IN_AFFECTED = "(entity_type, entity_id) IN (SELECT entity_type, entity_id FROM affected)"
+
+def apply_changes(cur: sqlite3.Cursor, out: CatalogWriter, bundle: Bundle, members: list[str],
+                  changed: list[str], removed: list[str], workers: int, large: set = frozenset()):
+    # Every entity key a changed/removed member contributed to before, or a
+    # changed member contributes to now, is rebuilt from all members that
+    # touch it, in archive order, so overlapping tables (CharacterExcel,
+    # CharacterStatExcel, ...) resolve exactly as in a full build. Alias slugs
+    # are first-come, so every entity claiming a slug of an affected entity
+    # (old or new claim) is affected too, transitively.
+    stale = set(changed) | set(removed)
+    cur.executescript(INCREMENTAL_SCHEMA)
+    cur.executemany("INSERT OR IGNORE INTO affected SELECT entity_type, entity_id FROM source_entity WHERE source=?",
+                    [(m,) for m in stale])
+
+    # first pass over the changed members keeps only their keys and claims,
+    # one member at a time; rows are parsed again when they are written
+    def note(entities, aliases):
+        cur.executemany("INSERT OR IGNORE INTO affected VALUES (?,?)", [(r[0], r[1]) for r in entities])
+        cur.executemany("INSERT INTO new_claim VALUES (?,?,?)", [(r[0], r[1], r[3]) for r in aliases])
+    for entities, aliases in iter_parsed(bundle, [m for m in changed if m not in large], workers):
+        note(entities, aliases)
+    with bundle.open() as zf:
+        for m in changed:
+            if m in large:
+                try:
+                    # a malformed table contributes nothing, but keys noted
+                    # before the error only widen the rebuild
+                    for entity, aliases in stream_rows(zf, m, bundle.decoder(m), bundle.row_keys):
+                        note([entity], aliases)
+                except ValueError:
+                    pass
+
+    while True:
+        before = cur.execute("SELECT count(*) FROM affected").fetchone()[0]
+        for claims in ("source_alias", "new_claim"):
+            cur.execute(f"INSERT OR IGNORE INTO affected_slug SELECT entity_type, alias_slug FROM {claims} WHERE {IN_AFFECTED}")
+        for claims in ("source_alias", "new_claim"):
+            cur.execute(f"""INSERT OR IGNORE INTO affected SELECT entity_type, entity_id FROM {claims}
+                            WHERE (entity_type, alias_slug) IN (SELECT entity_type, alias_slug FROM affected_slug)""")
+        if cur.execute("SELECT count(*) FROM affected").fetchone()[0] == before:
+            break
+
+    # unchanged members sharing an affected key are re-read for those keys only
+    others = {m for (m,) in cur.execute(f"SELECT DISTINCT source FROM source_entity WHERE {IN_AFFECTED}")} - stale
+    keys = set(cur.execute("SELECT entity_type, entity_id FROM affected"))
+
+    cur.execute(f"DELETE FROM entity_alias WHERE {IN_AFFECTED}")
+    cur.execute(f"DELETE FROM entity WHERE {IN_AFFECTED}")
+    for table in ("source_entity", "source_alias"):
+        cur.executemany(f"DELETE FROM {table} WHERE source=?", [(m,) for m in stale])
+    ingest(out, bundle, [m for m in members if m in others or m in stale], workers, large, keys=keys, stale=stale)
+
+def ingest(out: CatalogWriter, bundle: Bundle, members: list[str], workers: int, large: set = frozenset(),
+           keys: set = None, stale: set = ()):
+    # Writes members in archive order: large ones are streamed here while the
+    # pool parses the rest. Members in stale (all of them when keys is None)
+    # are recorded as sources, the rest only rewrite keys.
+    parsed = iter_parsed(bundle, [m for m in members if m not in large], workers)
+    with bundle.open() as zf:
+        for member in members:
+            only = None if keys is None or member in stale else keys
+            if member in large:
+                stream_member(out, zf, member, bundle.decoder(member), bundle.row_keys, keys=only)
+            else:
+                out.extend(*next(parsed), source=member if only is None else None, keys=only)
+
+def write_snapshot(cur: sqlite3.Cursor, path: Path):
+    # mmap-able id -> name/rarity table for consumers without sqlite (lib/CatalogSnapshot.py)
+    _load_lib()
+    from lib.CatalogSnapshot import WriteCatalogSnapshot
+    built_at = cur.execute("SELECT v FROM meta WHERE k='built_at'").fetchone()[0]
+    rows = cur.execute("SELECT entity_type, entity_id, canonical_name, dev_name, rarity FROM entity")
+    count = WriteCatalogSnapshot(path, rows, built_at)
+    print(f"Wrote snapshot {path} ({count} entities, {path.stat().st_size} bytes).")
+
+def build(zip_path: Path, out_sqlite: Path, bulk: bool = True, batch_size: int = 5000, workers: int = 1,
+          full: bool = False, stream_threshold: int = 16 << 20, search: bool = True,
+          encrypted: bool = False, schemas: tuple = (), hash_index: str = None, bundle_name: str = None,
+          snapshot: Path = None, rebuild_ratio: float = 0.5):
+    bundle = Bundle(zip_path, encrypted, schemas, hash_index, bundle_name)
     out_sqlite.parent.mkdir(parents=True, exist_ok=True)
     con = sqlite3.connect(out_sqlite)
     cur = con.cursor()
+    if bulk:
+        # a failed build is simply rerun, so trade durability for speed
+        cur.execute("PRAGMA journal_mode=WAL")
+        cur.execute("PRAGMA synchronous=OFF")
 
     schema = (Path(__file__).parent / "../data/catalog.sql").resolve()
     if not schema.exists():
@@ -60,94 +642,159 @@ def build(zip_path: Path, out_sqlite: Path):
           alias TEXT NOT NULL, alias_slug TEXT NOT NULL, lang TEXT,
           UNIQUE (entity_type, alias_slug)
         );
-        CREATE INDEX IF NOT EXISTS idx_alias_type_slug ON entity_alias(entity_type, alias_slug);
-        """)
+        """ + ALIAS_INDEX_SQL + ";")
     else:
         cur.executescript(schema.read_text(encoding="utf-8"))
+    cur.executescript(SOURCE_SCHEMA)
 
-    cur.execute("DELETE FROM entity")
-    cur.execute("DELETE FROM entity_alias")
+    with bundle.open() as zf:
+        current = {info.filename: (info.CRC, info.file_size) for info in zf.infolist()
+                   if info.filename.lower().endswith(".json") and detect_type(info.filename) != 0}
+    members = list(current)
+    previous = {name: (crc, size) for name, crc, size in cur.execute("SELECT name, crc32, size FROM source_file")}
 
-    added = 0
-    aliases = 0
+    # no member bookkeeping yet (first run, older catalog) means a full build
+    full = full or not previous or (
+        cur.execute("SELECT 1 FROM entity_alias LIMIT 1").fetchone() is not None
+        and cur.execute("SELECT 1 FROM source_alias LIMIT 1").fetchone() is None)
+    changed = [m for m in members if previous.get(m) != current[m]]
+    removed = [m for m in previous if m not in current]
+    if not full and sum(current[m][1] for m in changed) > rebuild_ratio * sum(size for _, size in current.values()):
+        # a new client version changes nearly everything: a full build is
+        # faster and streams, where the per-key rebuild re-reads members
+        print(f"{len(changed)}/{len(members)} members changed, rebuilding in full.")
+        full = True
+    out = CatalogWriter(cur, batch_size if bulk else 1)
+    # members this big are streamed row by row instead of parsed whole
+    large = {m for m in members if current[m][1] >= stream_threshold}
+    if full:
+        changed, removed = members, list(previous)
+        for table in ("entity", "entity_alias", "source_entity", "source_alias", "source_file"):
+            cur.execute(f"DELETE FROM {table}")
+        if bulk:
+            # rebuilt once after loading instead of maintained per insert
+            for index in DEFERRED_INDEXES:
+                cur.execute(f"DROP INDEX IF EXISTS {index}")
+        ingest(out, bundle, members, workers, large)
+    elif changed or removed:
+        apply_changes(cur, out, bundle, members, changed, removed, workers, large)
 
-    with zipfile.ZipFile(zip_path, "r") as zf:
-        for info in zf.infolist():
-            if not info.filename.lower().endswith(".json"):
-                continue
-            etype = detect_type(info.filename)
-            if etype == 0:
-                continue
+    out.flush()
+    cur.executemany("DELETE FROM source_file WHERE name=?", [(m,) for m in removed])
+    cur.executemany("INSERT OR REPLACE INTO source_file(name,crc32,size) VALUES (?,?,?)",
+                    [(m, *current[m]) for m in changed])
+    cur.execute(ALIAS_INDEX_SQL)
+    if not search:
+        # a stale index would answer for entities that are gone
+        cur.execute("DROP TABLE IF EXISTS entity_search")
+    elif full or changed or removed or not cur.execute(
+            "SELECT 1 FROM sqlite_master WHERE name='entity_search'").fetchone():
+        build_search_index(cur)
+    cur.execute("INSERT OR REPLACE INTO meta(k,v) VALUES('built_at', datetime('now'))")
+    con.commit()
+    if snapshot:
+        write_snapshot(cur, snapshot)
+    cur.executescript(SOURCE_SCHEMA)
+    if bulk:
+        # fold the WAL back so the catalog stays a single file
+        cur.execute("PRAGMA journal_mode=DELETE")
+    con.close()
+    mode = "full" if full else f"incremental: {len(changed)}/{len(members)} members changed, {len(removed)} removed"
+    print(f"Built {out_sqlite} with {out.added} entities and {out.alias_count} aliases ({mode}).")
 
-            raw = zf.read(info.filename).decode("utf-8","replace")
-            try:
-                data = json.loads(raw)
-            except Exception:
-                continue
+# -------- diff --------
+# Changeset between two catalogs (either side may also be a zip, built into a
+# temporary catalog first). Entities are compared by key, name fields and a
+# digest of meta_json, so only keys and short digests are held in memory.
 
-            rows = data
-            if isinstance(data, dict):
-                # sometimes tables wrap arrays under "Rows" or table name
-                for k in ("Rows","rows","Data","data"):
-                    if k in data and isinstance(data[k], list):
-                        rows = data[k]
-                        break
+def entity_digests(db: Path) -> dict:
+    con = sqlite3.connect(f"file:{Path(db).as_posix()}?mode=ro", uri=True)
+    try:
+        rows = con.execute("SELECT entity_type, entity_id, canonical_name, dev_name, rarity, meta_json FROM entity")
+        digests = {(t, i): (name, dev, rar, hashlib.blake2b((meta or "").encode("utf-8"), digest_size=8).hexdigest())
+                   for t, i, name, dev, rar, meta in rows}
+        built_at = con.execute("SELECT v FROM meta WHERE k='built_at'").fetchone()
+    finally:
+        con.close()
+    return {"built_at": built_at[0] if built_at else None, "entities": digests}
 
-            if not isinstance(rows, list):
-                continue
+DIFF_FIELDS = ("name", "dev_name", "rarity", "meta")
 
-            for row in rows:
-                if not isinstance(row, dict):
-                    continue
-                _id = pick(row, ID_KEYS)
-                if _id is None: 
-                    continue
-                try:
-                    _id = int(_id)
-                except Exception:
-                    continue
-
-                name = pick(row, NAME_KEYS) or pick(row, DEVNAME_KEYS) or f"{Path(info.filename).stem}#{_id}"
-                dev  = pick(row, DEVNAME_KEYS)
-                rar  = pick(row, RARITY_KEYS)
-
-                # stash everything else into meta_json (minus obvious cols)
-                meta = {k:v for k,v in row.items() if k not in set(ID_KEYS+NAME_KEYS+DEVNAME_KEYS+RARITY_KEYS)}
-                cur.execute(
-                    "INSERT OR REPLACE INTO entity(entity_type,entity_id,canonical_name,dev_name,rarity,meta_json) VALUES (?,?,?,?,?,?)",
-                    (etype, _id, str(name), (str(dev) if dev else None), (int(rar) if isinstance(rar,int) or (isinstance(rar,str) and rar.isdigit()) else None), json.dumps(meta, ensure_ascii=False))
-                )
-                added += 1
-
-                # collect obvious alias fields (all Name* keys)
-                for k,v in row.items():
-                    if not isinstance(k,str): 
-                        continue
-                    if not isinstance(v,(str,int,float)): 
-                        continue
-                    if re.match(r"^(Name|NAME)[A-Za-z]*$", k) and str(v).strip():
-                        a = str(v).strip()
-                        cur.execute(
-                            "INSERT OR IGNORE INTO entity_alias(entity_type,entity_id,alias,alias_slug,lang) VALUES (?,?,?,?,?)",
-                            (etype, _id, a, slug(a), None)
-                        )
-                        aliases += 1
-                # dev name as alias
-                if dev:
-                    cur.execute(
-                        "INSERT OR IGNORE INTO entity_alias(entity_type,entity_id,alias,alias_slug,lang) VALUES (?,?,?,?,?)",
-                        (etype, _id, str(dev), slug(str(dev)), None)
-                    )
-                    aliases += 1
+def diff_catalogs(old: Path, new: Path) -> dict:
+    a, b = entity_digests(old), entity_digests(new)
+    ea, eb = a["entities"], b["entities"]
 
-    cur.execute("INSERT OR REPLACE INTO meta(k,v) VALUES('built_at', datetime('now'))")
-    con.commit()
-    con.close()
-    print(f"Built {out_sqlite} with {added} entities and {aliases} aliases.")
+    def entry(key, row, **extra):
+        return {"entity_type": key[0], "entity_id": key[1], "name": row[0], **extra}
+
+    added = [entry(k, eb[k], meta_hash=eb[k][3]) for k in sorted(eb.keys() - ea.keys())]
+    removed = [entry(k, ea[k], meta_hash=ea[k][3]) for k in sorted(ea.keys() - eb.keys())]
+    changed = []
+    for k in sorted(ea.keys() & eb.keys()):
+        if ea[k] != eb[k]:
+            fields = [f for f, x, y in zip(DIFF_FIELDS, ea[k], eb[k]) if x != y]
+            changed.append(entry(k, eb[k], fields=fields, old_meta_hash=ea[k][3], new_meta_hash=eb[k][3]))
+    return {
+        "old": {"path": str(old), "built_at": a["built_at"], "entities": len(ea)},
+        "new": {"path": str(new), "built_at": b["built_at"], "entities": len(eb)},
+        "summary": {"added": len(added), "removed": len(removed), "changed": len(changed),
+                    "unchanged": len(ea.keys() & eb.keys()) - len(changed)},
+        "added": added,
+        "removed": removed,
+        "changed": changed,
+    }
+
+def diff(old: Path, new: Path, out: Path = None, **build_args):
+    with tempfile.TemporaryDirectory() as tmp:
+        sides = []
+        for n, path in enumerate((old, new)):
+            if zipfile.is_zipfile(path):
+                db = Path(tmp) / f"side{n}.sqlite"
+                # build progress goes to stderr so stdout stays pure JSON
+                with contextlib.redirect_stdout(sys.stderr):
+                    build(path, db, full=True, search=False, snapshot=None, **build_args)
+                sides.append(db)
+            else:
+                sides.append(path)
+        changes = diff_catalogs(*sides)
+    changes["old"]["path"], changes["new"]["path"] = str(old), str(new)
+    text = json.dumps(changes, ensure_ascii=False, indent=1)
+    if out:
+        out.write_text(text + "\n", encoding="utf-8")
+        s = changes["summary"]
+        print(f"Wrote {out}: {s['added']} added, {s['removed']} removed, {s['changed']} changed, {s['unchanged']} unchanged.")
+    else:
+        print(text)
 
 if __name__ == "__main__":
     ap = argparse.ArgumentParser()
-    ap.add_argument("--zip", required=True, help="Path to TableBundles.zip")
+    ap.add_argument("--zip", help="Path to TableBundles.zip")
+    ap.add_argument("--diff", nargs=2, metavar=("OLD", "NEW"), help="Write the changeset between two catalogs or zips instead of building")
+    ap.add_argument("--diff-out", help="Changeset JSON path for --diff (default: stdout)")
+    ap.add_argument("--encrypted", action="store_true", help="Read the official password-protected bundle directly")
+    ap.add_argument("--schema", help="JSON file of {table: {column: type}} for XOR-decoding columns (with --encrypted)")
+    ap.add_argument("--hash-index", help="Name->hash index from decrypt_tables.py to seed key derivation")
+    ap.add_argument("--bundle-name", help="Bundle name the zip password derives from, if the file was renamed")
     ap.add_argument("--out", default="data/catalog.sqlite", help="Output sqlite path")
+    ap.add_argument("--no-bulk", action="store_true", help="Row-by-row inserts with default pragmas")
+    ap.add_argument("--batch-size", type=int, default=5000, help="Rows per executemany in bulk mode")
+    ap.add_argument("--full", action="store_true", help="Rebuild everything instead of only changed members")
+    ap.add_argument("--stream-threshold", type=float, default=16, help="Stream members at least this many MB (uncompressed)")
+    ap.add_argument("--snapshot", help="Binary snapshot path (default: next to --out with a .snapshot suffix)")
+    ap.add_argument("--no-snapshot", action="store_true", help="Skip the binary snapshot")
+    ap.add_argument("--no-search", action="store_true", help="Skip the full-text search index")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Processes parsing zip members (1 = in-process)")
     args = ap.parse_args()
-    build(Path(args.zip), Path(args.out))
+    schemas = load_schemas(args.schema) if args.schema else ()
+    if args.diff:
+        diff(Path(args.diff[0]), Path(args.diff[1]), Path(args.diff_out) if args.diff_out else None,
+             workers=args.workers, encrypted=args.encrypted, schemas=schemas,
+             hash_index=args.hash_index, bundle_name=args.bundle_name)
+        raise SystemExit
+    if not args.zip:
+        ap.error("--zip is required unless --diff is given")
+    build(Path(args.zip), Path(args.out), bulk=not args.no_bulk, batch_size=args.batch_size, workers=args.workers,
+          full=args.full, stream_threshold=int(args.stream_threshold * (1 << 20)), search=not args.no_search,
+          encrypted=args.encrypted, schemas=schemas,
+          hash_index=args.hash_index, bundle_name=args.bundle_name,
+          snapshot=None if args.no_snapshot else Path(args.snapshot or Path(args.out).with_suffix(".snapshot")))
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+import argparse, sqlite3, sys, time
+from dataclasses import dataclass
+from pathlib import Path
+
+# Ranked name lookup on a catalog built by build_catalog.py, through its
+# entity_search trigram index. Results come back best first, one per entity:
+#   exact name, then prefix, then substring, then fuzzy (shared trigrams).
+# Catalogs without the index (older builds, --no-search) fall back to LIKE
+# scans over entity/entity_alias, which give the same tiers minus fuzzy.
+
+KIND_NAMES = ("name", "dev_name", "alias")
+EXACT, PREFIX, SUBSTRING, FUZZY = range(4)
+TIER_NAMES = ("exact", "prefix", "substring", "fuzzy")
+
+@dataclass
+class Match:
+    entity_type: int
+    entity_id: int
+    canonical_name: str
+    matched: str        # the name that matched, may be a dev name or alias
+    kind: str           # role of the matched name: name / dev_name / alias
+    tier: str           # exact / prefix / substring / fuzzy
+    score: float        # 1.0 for exact, trigram similarity for fuzzy
+
+def trigrams(s: str) -> set:
+    s = s.lower()
+    return {s[i:i+3] for i in range(len(s) - 2)}
+
+def _like_escape(s: str) -> str:
+    return s.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+def _phrase(s: str) -> str:
+    return '"' + s.replace('"', '""') + '"'
+
+class CatalogSearch:
+    def __init__(self, path, fuzzy_threshold: float = 0.3):
+        self.con = sqlite3.connect(f"file:{Path(path).as_posix()}?mode=ro", uri=True, check_same_thread=False)
+        self.fuzzy_threshold = fuzzy_threshold
+        self.indexed = self.con.execute(
+            "SELECT 1 FROM sqlite_master WHERE name='entity_search'").fetchone() is not None
+
+    def close(self):
+        self.con.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def search(self, query: str, entity_type: int = None, limit: int = 20, fuzzy: bool = True) -> list[Match]:
+        q = " ".join(query.split())
+        if not q or limit <= 0:
+            return []
+        best: dict[tuple, tuple] = {}   # (type, id) -> (tier, -score, matched, kind)
+
+        def offer(etype, eid, matched, kind, tier, score):
+            key = (etype, eid)
+            cand = (tier, -score, matched, kind)
+            if key not in best or cand < best[key]:
+                best[key] = cand
+
+        ql = q.lower()
+        for etype, eid, name, kind in self._substring(q, entity_type, limit):
+            nl = name.lower()
+            tier = EXACT if nl == ql else PREFIX if nl.startswith(ql) else SUBSTRING
+            offer(etype, eid, name, kind, tier, len(q) / len(name))
+
+        if fuzzy and self.indexed and len(best) < limit and len(q) >= 3:
+            grams = trigrams(q)
+            for etype, eid, name, kind in self._fuzzy(grams, entity_type, limit):
+                if (etype, eid) in best:
+                    continue
+                other = trigrams(name)
+                score = len(grams & other) / len(grams | other)
+                if score >= self.fuzzy_threshold:
+                    offer(etype, eid, name, kind, FUZZY, score)
+
+        ranked = sorted(best.items(), key=lambda kv: (kv[1][0], kv[1][1], len(kv[1][2]), kv[0]))[:limit]
+        names = self._canonical([key for key, _ in ranked])
+        return [Match(etype, eid, names.get((etype, eid), matched), matched, KIND_NAMES[kind], TIER_NAMES[tier],
+                      1.0 if tier == EXACT else -neg)
+                for (etype, eid), (tier, neg, matched, kind) in ranked]
+
+    def _substring(self, q: str, entity_type, limit: int):
+        # names containing q, exact and prefix hits ordered first so the
+        # candidate cap only ever drops weaker substring hits
+        where, args = "", []
+        if entity_type is not None:
+            where, args = " AND entity_type = ?", [entity_type]
+        order = "ORDER BY lower(name) = lower(?) DESC, name LIKE ? ESCAPE '\\' DESC, length(name) LIMIT ?"
+        order_args = [q, _like_escape(q) + "%", limit * 4]
+        if self.indexed and len(q) >= 3:
+            sql = f"SELECT entity_type, entity_id, name, kind FROM entity_search WHERE entity_search MATCH ?{where} {order}"
+            return self.con.execute(sql, [_phrase(q), *args, *order_args]).fetchall()
+        # trigram MATCH needs 3+ characters; shorter queries only make sense as prefixes
+        pattern = (_like_escape(q) + "%") if len(q) < 3 else ("%" + _like_escape(q) + "%")
+        if self.indexed:
+            sql = f"SELECT entity_type, entity_id, name, kind FROM entity_search WHERE name LIKE ? ESCAPE '\\'{where} {order}"
+        else:
+            sql = f"""SELECT entity_type, entity_id, name, kind FROM (
+                        SELECT entity_type, entity_id, canonical_name AS name, 0 AS kind FROM entity
+                        UNION ALL SELECT entity_type, entity_id, dev_name, 1 FROM entity WHERE dev_name IS NOT NULL
+                        UNION ALL SELECT entity_type, entity_id, alias, 2 FROM entity_alias
+                      ) WHERE name LIKE ? ESCAPE '\\'{where} {order}"""
+        return self.con.execute(sql, [pattern, *args, *order_args]).fetchall()
+
+    def _fuzzy(self, grams: set, entity_type, limit: int):
+        # any shared trigram is a candidate; bm25 puts names sharing the most
+        # (and the rarest) trigrams first
+        where, args = "", []
+        if entity_type is not None:
+            where, args = " AND entity_type = ?", [entity_type]
+        match = " OR ".join(_phrase(g) for g in sorted(grams))
+        sql = f"SELECT entity_type, entity_id, name, kind FROM entity_search WHERE entity_search MATCH ?{where} ORDER BY rank LIMIT ?"
+        return self.con.execute(sql, [match, *args, limit * 10]).fetchall()
+
+    def _canonical(self, keys: list) -> dict:
+        if not keys:
+            return {}
+        clause = " OR ".join(["(entity_type = ? AND entity_id = ?)"] * len(keys))
+        rows = self.con.execute(f"SELECT entity_type, entity_id, canonical_name FROM entity WHERE {clause}",
+                                [v for key in keys for v in key])
+        return {(t, i): name for t, i, name in rows}
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("query", help="Name, dev name or alias to look up")
+    ap.add_argument("--db", default="data/catalog.sqlite", help="Catalog sqlite path")
+    ap.add_argument("--type", type=int, help="Only this entity_type")
+    ap.add_argument("--limit", type=int, default=20, help="Maximum results")
+    ap.add_argument("--no-fuzzy", action="store_true", help="Only exact/prefix/substring matches")
+    args = ap.parse_args()
+    if not Path(args.db).exists():
+        sys.exit(f"{args.db} not found")
+    with CatalogSearch(args.db) as cs:
+        t0 = time.perf_counter()
+        matches = cs.search(args.query, args.type, args.limit, not args.no_fuzzy)
+        ms = (time.perf_counter() - t0) * 1000
+    for m in matches:
+        print(f"{m.entity_type:>3} {m.entity_id:>10}  {m.tier:<9} {m.score:4.2f}  {m.canonical_name}"
+              + (f"  [{m.kind}: {m.matched}]" if m.matched != m.canonical_name else ""))
+    print(f"{len(matches)} matches in {ms:.1f} ms" + ("" if cs.indexed else " (no search index, LIKE scan)"))
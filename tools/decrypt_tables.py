@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+import argparse, json, os, sys, time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from lib import TableEncryptionService, XXHashService
+from lib.TableService import DecryptedTableCache, MappedTableZipFile, TableZipFile
+
+# -------- worker --------
+# Each worker process opens the bundle once (initializer) and then decrypts
+# whole members; only names and small stats cross the process boundary.
+
+_zf = None
+_out_dir = None
+_schemas = {}
+_decoders = {}
+_xor = True
+
+ROW_KEYS = ("Rows","rows","Data","data","DataList")
+
+def _init_worker(bundle: str, out_dir: str, schemas: dict, xor: bool, cache_dir: str, cache_compression: str,
+                 hash_index: str):
+    global _zf, _out_dir, _schemas, _xor
+    if hash_index:
+        TableEncryptionService.LoadSeedIndex(XXHashService.HashIndex(hash_index))
+    cache = DecryptedTableCache(cache_dir, cache_compression) if cache_dir else None
+    _zf = MappedTableZipFile(bundle, cache=cache)
+    _out_dir = Path(out_dir)
+    _schemas = schemas
+    _xor = xor
+
+def _decoder(table: str):
+    if table not in _decoders:
+        _decoders[table] = TableEncryptionService.CompileRowDecoder(_schemas[table])
+    return _decoders[table]
+
+def decode_rows(payload, decoder):
+    # Decodes the schema's columns of every row in place, leaving the other
+    # columns and any wrapper object as they are. Returns (rows, rows kept as
+    # stored because they lack a schema column), or None without a row array.
+    rows = payload
+    if isinstance(payload, dict):
+        rows = next((payload[k] for k in ROW_KEYS if isinstance(payload.get(k), list)), None)
+    if not isinstance(rows, list):
+        return None
+    skipped = 0
+    for row in rows:
+        try:
+            row.update(zip(decoder.columns, decoder.decode(row)))
+        except (KeyError, TypeError, AttributeError):
+            skipped += 1
+    return len(rows), skipped
+
+def member_path(out_dir: Path, name: str) -> Path:
+    # like ZipFile.extract, never write outside out_dir ("../x", "/x", "C:x")
+    root = out_dir.resolve()
+    target = (root / name).resolve()
+    if not target.is_relative_to(root) or target == root:
+        raise ValueError(f"member path escapes {out_dir}")
+    return target
+
+def decode_member(name: str):
+    t0 = time.perf_counter()
+    target = member_path(_out_dir, name)
+    with _zf.open(name) as f:
+        data = f.read()
+    size_in = len(data)
+    stem = Path(name).stem
+    note = ""
+
+    if name.lower().endswith(".json") and stem in _schemas:
+        payload = json.loads(data.decode("utf-8"))
+        counts = decode_rows(payload, _decoder(stem))
+        if counts is None:
+            note = "no row array found, written as stored"
+        else:
+            data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            if counts[1]:
+                note = f"{counts[1]}/{counts[0]} rows lack schema columns, kept as stored"
+    elif _xor and name.lower().endswith(".bytes"):
+        # whole-file XOR keyed by the table name, as the client does for ExcelDB blobs
+        data = TableEncryptionService.XOR(stem, bytearray(data), cache=False)
+
+    target.parent.mkdir(parents=True, exist_ok=True)
+    target.write_bytes(data)
+    return name, size_in, len(data), time.perf_counter() - t0, note
+
+# -------- main --------
+
+def ensure_hash_index(path: Path, client_version: str, bundle: Path, names: list, schemas: dict):
+    # (re)build the name -> hash index when missing or from another client version
+    if path.exists():
+        index = XXHashService.HashIndex(path)
+        current = index.client_version
+        index.close()
+        if current == client_version:
+            return
+    keys = {bundle.name, *names, *(Path(n).stem for n in names), *schemas}
+    for schema in schemas.values():
+        keys.update(schema)
+    count = XXHashService.BuildHashIndex(path, keys, client_version)
+    print(f"Built hash index {path} ({count} names, version {client_version!r})")
+
+def run(bundle: Path, out_dir: Path, workers: int, schemas: dict, xor: bool, top: int,
+        cache_dir: str = None, cache_compression: str = None,
+        hash_index: Path = None, client_version: str = ""):
+    with TableZipFile(str(bundle)) as zf:
+        names = [i.filename for i in zf.infolist() if not i.is_dir()]
+    if hash_index:
+        ensure_hash_index(hash_index, client_version, bundle, names, schemas)
+
+    t0 = time.perf_counter()
+    results = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(str(bundle), str(out_dir), schemas, xor, cache_dir, cache_compression,
+                                       str(hash_index) if hash_index else None)) as ex:
+        futures = {ex.submit(decode_member, n): n for n in names}
+        for fut in as_completed(futures):
+            try:
+                results.append(fut.result())
+            except Exception as e:
+                print(f"[!] {futures[fut]}: {e}", file=sys.stderr)
+    wall = time.perf_counter() - t0
+
+    results.sort(key=lambda r: r[3], reverse=True)
+    shown = results if top <= 0 else results[:top]
+    print(f"{'member':<60} {'in':>10} {'out':>10} {'ms':>9} {'MB/s':>8}")
+    for name, size_in, size_out, secs, _ in shown:
+        mbps = size_in / secs / 1e6 if secs else 0.0
+        print(f"{name[-60:]:<60} {size_in:>10} {size_out:>10} {secs*1000:>9.1f} {mbps:>8.1f}")
+    if len(shown) < len(results):
+        print(f"... {len(results) - len(shown)} more")
+
+    for name, *_, note in sorted(results):
+        if note:
+            print(f"[!] {name}: {note}", file=sys.stderr)
+
+    total_in = sum(r[1] for r in results)
+    cpu = sum(r[3] for r in results)
+    print(f"Decoded {len(results)}/{len(names)} members, {total_in/1e6:.1f} MB in {wall:.2f}s "
+          f"({total_in/wall/1e6 if wall else 0:.1f} MB/s wall, {cpu:.2f}s worker time, {workers} workers) -> {out_dir}")
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--zip", required=True, help="Path to an encrypted TableBundles zip")
+    ap.add_argument("--out", default="data/tables", help="Output directory")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes")
+    ap.add_argument("--schema", help="JSON file of {table: {column: type}} for row decoding of JSON members")
+    ap.add_argument("--no-xor", action="store_true", help="Write .bytes members without the table-name XOR")
+    ap.add_argument("--cache", help="Directory for decrypted members, reused while their CRC is unchanged")
+    ap.add_argument("--cache-compression", choices=["zlib","zstd"], help="Compress cached members")
+    ap.add_argument("--hash-index", help="Name->hash index file, built here if missing or stale")
+    ap.add_argument("--client-version", default="", help="Client version the hash index belongs to")
+    ap.add_argument("--top", type=int, default=20, help="Slowest members to list (0 = all)")
+    args = ap.parse_args()
+    schemas = json.loads(Path(args.schema).read_text(encoding="utf-8")) if args.schema else {}
+    run(Path(args.zip), Path(args.out), args.workers, schemas, not args.no_xor, args.top,
+        args.cache, args.cache_compression,
+        Path(args.hash_index) if args.hash_index else None, args.client_version)